@@ -1,18 +1,54 @@
 # backend/app/ai_agent.py
 
 import os
-import requests
+import re
 import json
+import asyncio
 import hashlib
-from typing import List, Dict
-
-# Works inside Docker (service name = "ollama") and locally (localhost)
-OLLAMA_BASE = os.environ.get("OLLAMA_BASE", "http://localhost:11434")
-OLLAMA_GENERATE = f"{OLLAMA_BASE}/api/generate"
-MODEL = "phi3:mini"
-
-def extract_requirements_from_text(text: str) -> Dict:
-    prompt = f"""
+import httpx
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+from . import embeddings
+from .llm import ollama
+from .metrics import log_event
+
+# Bump whenever build_summary_prompt changes so cached summaries expire
+SUMMARY_PROMPT_VERSION = 1
+# Same for build_digest_prompt / build_reduce_prompt (map-reduce mode)
+DIGEST_PROMPT_VERSION = 1
+
+# single     : one prompt with every application (original behaviour)
+# map_reduce : digest each application separately, then compare digests
+# auto       : map_reduce once there are SUMMARY_MAP_REDUCE_MIN_APPS
+#              applications or the joined text gets too long for the model
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "auto").lower()
+SUMMARY_MAP_REDUCE_MIN_APPS = int(os.environ.get("SUMMARY_MAP_REDUCE_MIN_APPS", "4"))
+# phi3:mini has a 4k-token window; ~4 chars per token leaves room for the prompt
+SUMMARY_MAX_PROMPT_CHARS = int(os.environ.get("SUMMARY_MAX_PROMPT_CHARS", "10000"))
+
+# Bump whenever build_extraction_prompt changes so cached windows expire
+EXTRACT_PROMPT_VERSION = 1
+
+# single  : whole tender text in one prompt (original behaviour)
+# chunked : overlapping section-aware windows, extracted concurrently
+# auto    : chunked once the text is longer than one window
+EXTRACT_MODE = os.environ.get("EXTRACT_MODE", "auto").lower()
+EXTRACT_WINDOW_CHARS = int(os.environ.get("EXTRACT_WINDOW_CHARS", "6000"))
+EXTRACT_WINDOW_OVERLAP = int(os.environ.get("EXTRACT_WINDOW_OVERLAP", "500"))
+# Short sections are packed into runs of about this many sections per
+# window (1 = one window per section), see requirement_windows
+EXTRACT_PACK_SECTIONS = int(os.environ.get("EXTRACT_PACK_SECTIONS", "4"))
+# Windows waiting on the model at once (the LLM client caps actual
+# in-flight generations separately)
+EXTRACT_CONCURRENCY = int(os.environ.get("EXTRACT_CONCURRENCY", "4"))
+# Two requirements closer than this (cosine) are merged; only used with
+# a real embedding model, mock vectors carry no meaning
+EXTRACT_DEDUP_SIMILARITY = float(os.environ.get("EXTRACT_DEDUP_SIMILARITY", "0.92"))
+
+
+def build_extraction_prompt(text: str) -> str:
+    return f"""
 You are an information extraction system.
 
 Extract clear, atomic requirements from the following tender.
@@ -30,50 +66,324 @@ Tender text:
 {text}
 """
 
-    r = None  # ✅ ensure r is always defined
 
-    try:
-        r = requests.post(
-            OLLAMA_GENERATE,
-            json={
-                "model": MODEL,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=120
-        )
-        r.raise_for_status()
+def parse_requirements(raw: str) -> Dict:
+    raw = (raw or "").strip()
+    if not raw:
+        raise ValueError("Empty response from Ollama")
 
-        raw = r.json().get("response", "").strip()
-        if not raw:
-            raise ValueError("Empty response from Ollama")
+    start = raw.find("{")
+    end = raw.rfind("}") + 1
+    if start == -1 or end == -1:
+        raise ValueError("No JSON found in model output")
 
-        start = raw.find("{")
-        end = raw.rfind("}") + 1
-        if start == -1 or end == -1:
-            raise ValueError("No JSON found in model output")
+    data = json.loads(raw[start:end])
 
-        data = json.loads(raw[start:end])
+    if "requirements" not in data:
+        raise ValueError("Missing 'requirements' key")
 
-        if "requirements" not in data:
-            raise ValueError("Missing 'requirements' key")
+    return data
 
-        return data
 
-    except Exception as e:
-        print("❌ Requirement extraction failed")
-        print("Reason:", e)
+def extract_requirements_from_text(text: str) -> Dict:
+    raw = None  # ✅ ensure raw is always defined
 
-        if r is not None:
-            print("Raw Ollama output:", r.text)
-        else:
-            print("Raw Ollama output: request not sent")
+    try:
+        raw = ollama.generate(build_extraction_prompt(text), timeout=120).strip()
+        return parse_requirements(raw)
+
+    except Exception as e:
+        log_event(
+            "extraction_failed",
+            error=f"{type(e).__name__}: {e}",
+            # None: the request itself failed
+            raw_output=raw[:2000] if raw is not None else None,
+        )
 
         return {
             "requirements": [],
             "confidence": 0.0
         }
 
+
+# ---------------------------
+# CHUNKED REQUIREMENT EXTRACTION
+# ---------------------------
+# Headings that open a new top-level section: "3.", "3 Scope",
+# "SECTION 4", "Annex B", "PART II", ...
+_MAJOR_HEADING = re.compile(
+    r"^\s*(?:(?:section|chapter|part|annex|annexure|appendix|schedule)\b"
+    r"|\d{1,3}[.)]?\s+[A-Za-z]|\d{1,3}\.\s*$)",
+    re.IGNORECASE,
+)
+
+
+def extract_mode(text: str) -> str:
+    if EXTRACT_MODE in ("single", "chunked"):
+        return EXTRACT_MODE
+    return "chunked" if len(text or "") > EXTRACT_WINDOW_CHARS else "single"
+
+
+def _is_major_heading(paragraph: str) -> bool:
+    first = paragraph.strip().split("\n", 1)[0]
+    if len(first) > 120:
+        return False
+    return bool(_MAJOR_HEADING.match(first)) or (first.isupper() and len(first.split()) <= 10)
+
+
+def _split_long(text: str, size: int, overlap: int) -> List[str]:
+    """
+    Hard-split one oversized section into overlapping pieces, cutting
+    at line/sentence/word boundaries where possible.
+    """
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            for sep in ("\n", ". ", " "):
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        pieces.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        # Back up by `overlap`, then forward to the next word start
+        nxt = max(end - overlap, start + 1)
+        space = text.find(" ", nxt, end)
+        start = space + 1 if space != -1 else nxt
+    return [p for p in pieces if p]
+
+
+def _opens_run(section: str, pack: int) -> bool:
+    """
+    Content-defined packing boundary: a section opens a new run when
+    the hash of its heading line says so. Headings, not bodies, so
+    editing a section's text never moves a boundary, and the choice
+    does not depend on any earlier section.
+    """
+    if pack <= 1:
+        return True
+    heading = section.split("\n", 1)[0].strip()
+    return int(hashlib.sha256(heading.encode()).hexdigest()[:8], 16) % pack == 0
+
+
+def requirement_windows(
+    text: str,
+    size: int = EXTRACT_WINDOW_CHARS,
+    overlap: int = EXTRACT_WINDOW_OVERLAP,
+    pack: int = EXTRACT_PACK_SECTIONS,
+) -> List[str]:
+    """
+    Split tender text into extraction windows.
+
+    Windows break at major headings. Consecutive sections are grouped
+    into runs at heading-hash boundaries (about `pack` sections each);
+    a run that fits in `size` is one window, otherwise each of its
+    sections is its own window. A section longer than `size` is cut
+    into pieces overlapping by `overlap` chars, so a requirement on a
+    cut line is seen whole. Editing one section therefore changes only
+    the window holding it, unless the edit moves its run across `size`.
+    """
+    text = (text or "").strip()
+    if extract_mode(text) == "single":
+        return [text]
+
+    # Group paragraphs into top-level sections
+    sections: List[str] = []
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        if sections and not _is_major_heading(para):
+            sections[-1] += "\n\n" + para
+        else:
+            sections.append(para)
+
+    runs: List[List[str]] = []
+    for section in sections:
+        if runs and not _opens_run(section, pack):
+            runs[-1].append(section)
+        else:
+            runs.append([section])
+
+    windows: List[str] = []
+    for run in runs:
+        joined = "\n\n".join(run)
+        if len(joined) <= size:
+            # Short sections share a window to save model calls
+            windows.append(joined)
+            continue
+        for section in run:
+            if len(section) > size:
+                windows.extend(_split_long(section, size, overlap))
+            else:
+                windows.append(section)
+    return windows
+
+
+def extraction_cache_key(window: str) -> str:
+    h = hashlib.sha256(f"{ollama.model}:{EXTRACT_PROMPT_VERSION}\n".encode())
+    h.update(window.encode())
+    return h.hexdigest()
+
+
+async def aextract_window(window: str) -> Dict:
+    raw = await ollama.agenerate(build_extraction_prompt(window), timeout=120)
+    data = parse_requirements(raw)
+
+    try:
+        confidence = float(data.get("confidence", 0.9))
+    except (TypeError, ValueError):
+        confidence = 0.9
+
+    return {
+        "requirements": [
+            r for r in data.get("requirements") or []
+            if isinstance(r, dict) and str(r.get("text", "")).strip()
+        ],
+        "confidence": confidence,
+    }
+
+
+class ExtractionIncomplete(RuntimeError):
+    """
+    Some windows failed (LLM unreachable, timeout, unparseable output).
+    `fresh` holds the windows that did succeed, for the cache.
+    """
+
+    def __init__(self, failed: int, total: int, fresh: Dict[str, Dict]):
+        super().__init__(f"Requirement extraction failed for {failed} of {total} windows")
+        self.fresh = fresh
+
+
+async def aextract_windows(
+    windows: List[str],
+    cached: Optional[Dict[str, Dict]] = None,
+) -> Tuple[List[Optional[Dict]], Dict[str, Dict]]:
+    """
+    Extract every window not in `cached` (keyed by extraction_cache_key),
+    at most EXTRACT_CONCURRENCY at a time. Returns (per-window results in
+    order, None for failed windows; fresh results to cache).
+    """
+    cached = cached or {}
+    sem = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+    fresh: Dict[str, Dict] = {}
+
+    async def run(window: str) -> Optional[Dict]:
+        key = extraction_cache_key(window)
+        if key in cached:
+            return cached[key]
+        if key in fresh:
+            return fresh[key]
+
+        async with sem:
+            try:
+                result = await aextract_window(window)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_event("extraction_failed", window_chars=len(window), error=f"{type(e).__name__}: {e}")
+                return None
+
+        fresh[key] = result
+        return result
+
+    results = await asyncio.gather(*(run(w) for w in windows))
+    return list(results), fresh
+
+
+def _requirement_key(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def merge_requirements(results: List[Optional[Dict]]) -> Dict:
+    """
+    Merge per-window results: exact (normalized text) duplicates first,
+    then near duplicates by embedding similarity. A merged requirement
+    keeps the first wording and the largest quantity.
+    """
+    merged: List[dict] = []
+    seen: Dict[str, int] = {}
+    confidences = []
+
+    for result in results:
+        if result is None:
+            continue
+        confidences.append(float(result.get("confidence", 0.9)))
+
+        for r in result.get("requirements", []):
+            text = str(r.get("text", "")).strip()
+            key = _requirement_key(text)
+            if not key:
+                continue
+
+            if key in seen:
+                kept = merged[seen[key]]
+                kept["quantity"] = max(_quantity(kept), _quantity(r))
+                continue
+
+            seen[key] = len(merged)
+            merged.append({**r, "text": text, "quantity": _quantity(r)})
+
+    if len(merged) > 1 and embeddings.EMBED_BACKEND != "mock":
+        merged = _dedup_by_similarity(merged)
+
+    return {
+        "requirements": merged,
+        "confidence": round(sum(confidences) / len(confidences), 3) if confidences else 0.0,
+    }
+
+
+def _quantity(r: dict) -> int:
+    try:
+        return max(1, int(r.get("quantity", 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _dedup_by_similarity(reqs: List[dict]) -> List[dict]:
+    vecs = np.asarray(embed_batch([r["text"] for r in reqs]), dtype="float32")
+    vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    sims = vecs @ vecs.T
+
+    kept: List[int] = []
+    for i in range(len(reqs)):
+        dup = next((k for k in kept if sims[i, k] >= EXTRACT_DEDUP_SIMILARITY), None)
+        if dup is None:
+            kept.append(i)
+        else:
+            reqs[dup]["quantity"] = max(reqs[dup]["quantity"], reqs[i]["quantity"])
+    return [reqs[k] for k in kept]
+
+
+def extract_requirements(
+    windows: List[str],
+    cached: Optional[Dict[str, Dict]] = None,
+) -> Tuple[Dict, Dict[str, Dict]]:
+    """
+    Requirement extraction for the pipeline (sync, worker thread) over
+    the windows from requirement_windows(). Returns ({"requirements",
+    "confidence"}, fresh window results to cache). A short tender is a
+    single window, i.e. the original one-prompt extraction. Raises
+    ExtractionIncomplete if any window failed, rather than returning a
+    partial (or empty) requirement list.
+    """
+    results, fresh = asyncio.run(aextract_windows(windows, cached))
+
+    failed = sum(1 for r in results if r is None)
+    if len(windows) > 1:
+        log_event(
+            "extraction_windows", windows=len(windows), extracted=len(fresh),
+            cached=len(windows) - len(fresh) - failed, failed=failed,
+        )
+    if failed:
+        raise ExtractionIncomplete(failed, len(windows), fresh)
+
+    return merge_requirements(results), fresh
+
+
 def generate_proposal_text(
     requirements: Dict,
     applicant_info: Dict,
@@ -97,34 +407,27 @@ Pricing:
 """
 
     try:
-        r = requests.post(
-            OLLAMA_GENERATE,
-            json={
-                "model": MODEL,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=120
-        )
-        r.raise_for_status()
-
-        return r.json().get("response", "Draft proposal unavailable")
+        return ollama.generate(prompt, timeout=120) or "Draft proposal unavailable"
 
     except Exception as e:
-        print("❌ Proposal generation failed:", e)
+        log_event("proposal_text_failed", error=f"{type(e).__name__}: {e}")
         return "Draft proposal unavailable"
 
 
 def embed_text(text: str) -> List[float]:
     """
-    Deterministic lightweight embedding (mock)
-    Safe for FAISS testing
+    Embed one text with the configured backend (see embeddings.py)
     """
+    return embeddings.embed_text(text)
 
-    h = hashlib.md5(text.encode()).digest()
-    return [b / 255 for b in h]
 
-def build_user_summary(applications: list[dict]) -> dict:
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    """
+    Batched, cached embedding of many texts
+    """
+    return embeddings.embed_batch(texts)
+
+def build_summary_prompt(applications: list[dict]) -> str:
     """
     applications = [
       {
@@ -151,7 +454,7 @@ Proposal:
     # ---------------------------
     # STRICT JSON PROMPT
     # ---------------------------
-    prompt = f"""
+    return f"""
 You are a professional RFP evaluation system.
 
 Analyze ALL applications below.
@@ -193,26 +496,12 @@ Applications:
 {joined}
 """
 
-    # ---------------------------
-    # Call Ollama
-    # ---------------------------
-    r = requests.post(
-        OLLAMA_GENERATE,
-        json={
-            "model": MODEL,
-            "prompt": prompt,
-            "stream": False
-        },
-        timeout=180
-    )
-
-    r.raise_for_status()
-
-    raw = r.json().get("response", "").strip()
 
+def parse_json_block(raw: str) -> dict:
     # ---------------------------
     # SAFE JSON EXTRACTION
     # ---------------------------
+    raw = (raw or "").strip()
     try:
         start = raw.index("{")
         end = raw.rindex("}") + 1
@@ -222,4 +511,291 @@ Applications:
             f"AI returned invalid JSON.\nRaw output:\n{raw}"
         ) from e
 
-    return parsed
\ No newline at end of file
+    return parsed
+
+
+def parse_summary(raw: str) -> dict:
+    return parse_json_block(raw)
+
+
+def summary_mode(applications: list[dict]) -> str:
+    if SUMMARY_MODE in ("single", "map_reduce"):
+        return SUMMARY_MODE
+
+    total = sum(len(a["text"] or "") for a in applications)
+    if len(applications) >= SUMMARY_MAP_REDUCE_MIN_APPS or total > SUMMARY_MAX_PROMPT_CHARS:
+        return "map_reduce"
+    return "single"
+
+
+def summary_cache_key(tender_id: int, applications: list[dict]) -> str:
+    """
+    Hash of everything a summary depends on: the tender, each
+    application's id and text, the model, the mode and prompt versions.
+    """
+    h = hashlib.sha256(
+        f"{tender_id}:{ollama.model}:{summary_mode(applications)}:"
+        f"{SUMMARY_PROMPT_VERSION}:{DIGEST_PROMPT_VERSION}".encode()
+    )
+    for a in sorted(applications, key=lambda a: a["application_id"]):
+        h.update(f"\x00{a['application_id']}\x00{a['email']}\x00".encode())
+        h.update((a["text"] or "").encode())
+    return h.hexdigest()
+
+
+def build_user_summary(applications: list[dict]) -> dict:
+    raw = ollama.generate(build_summary_prompt(applications), timeout=180)
+    return parse_summary(raw)
+
+
+async def abuild_user_summary(applications: list[dict]) -> dict:
+    """
+    Async build_user_summary: waits on the shared client without
+    holding a worker thread.
+    """
+    raw = await ollama.agenerate(build_summary_prompt(applications), timeout=180)
+    return parse_summary(raw)
+
+
+async def astream_user_summary(applications: list[dict]):
+    """
+    Yield raw summary text chunks as the model produces them.
+    Callers join the chunks and run parse_summary on the result.
+    """
+    async for chunk in ollama.astream(build_summary_prompt(applications), timeout=180):
+        yield chunk
+
+
+# ---------------------------
+# MAP-REDUCE SUMMARY
+# ---------------------------
+def digest_cache_key(application: dict) -> str:
+    h = hashlib.sha256(
+        f"{ollama.model}:{DIGEST_PROMPT_VERSION}:{application['application_id']}:"
+        f"{application['email']}\x00".encode()
+    )
+    h.update((application["text"] or "").encode())
+    return h.hexdigest()
+
+
+def build_digest_prompt(application: dict) -> str:
+    return f"""
+You are a professional RFP evaluation system.
+
+Evaluate ONE vendor application on its own.
+
+Return ONLY valid JSON in EXACTLY this format:
+
+{{
+  "price": string,
+  "sku": string,
+  "strengths": [string],
+  "weaknesses": [string],
+  "score": number,
+  "brief": string
+}}
+
+Rules:
+- score is 0 to 10, higher is better
+- If price is missing, infer a reasonable estimate
+- Keep brief under 40 words
+- Do NOT include explanations outside JSON
+
+Application ID: {application['application_id']}
+Email: {application['email']}
+Proposal:
+{application['text']}
+"""
+
+
+def _normalize_digest(application: dict, data: dict) -> dict:
+    # Identity comes from our input, never from the model
+    try:
+        score = float(data.get("score", 0))
+    except (TypeError, ValueError):
+        score = 0.0
+
+    return {
+        "application_id": application["application_id"],
+        "email": application["email"],
+        "price": str(data.get("price", "")),
+        "sku": str(data.get("sku", "")),
+        "strengths": list(data.get("strengths") or []),
+        "weaknesses": list(data.get("weaknesses") or []),
+        "score": score,
+        "brief": str(data.get("brief", "")),
+    }
+
+
+async def adigest_application(application: dict) -> dict:
+    """
+    Map step: summarize and score a single application.
+    """
+    raw = await ollama.agenerate(build_digest_prompt(application), timeout=120)
+    return _normalize_digest(application, parse_json_block(raw))
+
+
+async def adigest_applications(
+    applications: list[dict],
+    cached: Optional[Dict[int, dict]] = None,
+):
+    """
+    Yield (application_id, digest, fresh) as digests become available:
+    cached ones first, then new ones in completion order. Map calls run
+    concurrently, bounded by the LLM client's semaphore. A failed map
+    call yields a zero-score placeholder (unavailable=True) with
+    fresh=False so it is not cached. A timeout is raised instead: the
+    model is not answering, so the remaining calls are cancelled.
+    """
+    cached = cached or {}
+    todo = []
+
+    for a in applications:
+        if a["application_id"] in cached:
+            yield a["application_id"], cached[a["application_id"]], False
+        else:
+            todo.append(a)
+
+    async def run(a):
+        try:
+            return a, await adigest_application(a), True
+        except (asyncio.CancelledError, httpx.TimeoutException):
+            raise
+        except Exception as e:
+            log_event("digest_failed", application_id=a["application_id"], error=f"{type(e).__name__}: {e}")
+            placeholder = _normalize_digest(a, {"brief": "Evaluation unavailable"})
+            placeholder["unavailable"] = True
+            return a, placeholder, False
+
+    tasks = [asyncio.ensure_future(run(a)) for a in todo]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            a, digest, fresh = await fut
+            yield a["application_id"], digest, fresh
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+def build_reduce_prompt(digests: List[dict]) -> str:
+    compact = "\n".join(
+        json.dumps({
+            "application_id": d["application_id"],
+            "price": d["price"],
+            "score": d["score"],
+            "strengths": d["strengths"][:3],
+            "weaknesses": d["weaknesses"][:3],
+            "brief": d["brief"],
+        })
+        for d in digests
+    )
+
+    return f"""
+You are a professional RFP evaluation system.
+
+Below are one-line digests of vendor applications, already evaluated.
+Compare them and choose the BEST application overall.
+
+Return ONLY valid JSON in EXACTLY this format:
+
+{{
+  "application_id": number,
+  "verdict": string,
+  "brief": string
+}}
+
+Digests:
+{compact}
+"""
+
+
+async def astream_reduce(digests: List[dict]):
+    async for chunk in ollama.astream(build_reduce_prompt(digests), timeout=120):
+        yield chunk
+
+
+def reduce_summary(raw: Optional[str], digests: List[dict]) -> dict:
+    """
+    Assemble the usual {best_application, comparison} summary from the
+    digests and the reduce answer. Falls back to the top score when the
+    reduce output is missing or unusable; such a summary, or one built
+    on an unavailable digest, is marked "partial" and must not be cached.
+    """
+    by_id = {d["application_id"]: d for d in digests}
+    choice: dict = {}
+    partial = any(d.get("unavailable") for d in digests)
+    if raw is None and len(digests) > 1:
+        partial = True
+
+    if raw is not None:
+        try:
+            choice = parse_json_block(raw)
+        except RuntimeError as e:
+            log_event("summary_reduce_failed", error=str(e))
+
+    try:
+        best_id = int(choice.get("application_id"))
+    except (TypeError, ValueError):
+        best_id = None
+
+    if best_id not in by_id:
+        best_id = max(digests, key=lambda d: d["score"])["application_id"]
+        choice = {}
+        partial = partial or len(digests) > 1
+
+    best = by_id[best_id]
+
+    summary = {
+        "best_application": {
+            "application_id": best_id,
+            "email": best["email"],
+            "price": best["price"],
+            "sku": best["sku"],
+            "verdict": str(choice.get("verdict") or f"Highest score ({best['score']:g}/10)"),
+            "brief": str(choice.get("brief") or best["brief"]),
+        },
+        "comparison": [
+            {
+                "application_id": d["application_id"],
+                "email": d["email"],
+                "price": d["price"],
+                "strengths": d["strengths"],
+                "weaknesses": d["weaknesses"],
+            }
+            for d in digests
+        ],
+    }
+    if partial:
+        summary["partial"] = True
+    return summary
+
+
+async def amap_reduce_summary(
+    applications: list[dict],
+    cached: Optional[Dict[int, dict]] = None,
+) -> Tuple[dict, Dict[int, dict]]:
+    """
+    Hierarchical summary. Returns (summary, fresh digests to cache).
+    Only applications missing from `cached` cost a map call. LLM
+    timeouts propagate (the route answers 504).
+    """
+    digests: Dict[int, dict] = {}
+    fresh: Dict[int, dict] = {}
+
+    async for app_id, digest, is_fresh in adigest_applications(applications, cached):
+        digests[app_id] = digest
+        if is_fresh:
+            fresh[app_id] = digest
+
+    ordered = [digests[a["application_id"]] for a in applications]
+
+    raw = None
+    if len(ordered) > 1:
+        try:
+            raw = await ollama.agenerate(build_reduce_prompt(ordered), timeout=120)
+        except (asyncio.CancelledError, httpx.TimeoutException):
+            raise
+        except Exception as e:
+            log_event("summary_reduce_failed", error=f"{type(e).__name__}: {e}")
+
+    return reduce_summary(raw, ordered), fresh
@@ -1,6 +1,13 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import event
 
 from .models import User
 from .db import get_session
@@ -8,41 +15,177 @@ from .auth_utils import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# How long a loaded user row is reused without going back to the DB
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "2048"))
+# How long after issue a token's own "role" claim is trusted for role
+# checks; older tokens are checked against the (cached) user row
+CLAIMS_TRUST_SECONDS = float(os.environ.get("CLAIMS_TRUST_SECONDS", "300"))
+
 
 # =========================
-# GET CURRENT USER
+# USER CACHE
 # =========================
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+class UserCache:
+    """
+    TTL + LRU bounded cache of user rows, keyed by id.
+
+    Invalidation is per process: other workers see a change once their
+    entry expires (USER_CACHE_TTL_SECONDS) and once the tokens issued
+    before it age past CLAIMS_TRUST_SECONDS.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL_SECONDS, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[int, tuple]" = OrderedDict()
+        # user_id -> time of the last role change / deletion
+        self._changed_at: Dict[int, float] = {}
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+
+            expires, fields = item
+            if expires < time.monotonic():
+                del self._items[user_id]
+                return None
+
+            self._items.move_to_end(user_id)
+
+        # Fresh detached copy per caller; cached state is never shared
+        return User(**fields)
+
+    def put(self, user: User) -> None:
+        fields = {
+            "id": user.id,
+            "email": user.email,
+            "hashed_password": user.hashed_password,
+            "role": user.role,
+        }
+        with self._lock:
+            self._items[user.id] = (time.monotonic() + self.ttl, fields)
+            self._items.move_to_end(user.id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+            self._changed_at[user_id] = time.time()
+
+    def changed_since(self, user_id: int, issued_at: float) -> bool:
+        with self._lock:
+            changed = self._changed_at.get(user_id)
+        return changed is not None and changed >= issued_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+user_cache = UserCache()
+
+
+# Any ORM update/delete of a user (role change, password rehash,
+# removal) drops the cached row and stops trusting older tokens' claims.
+# Bulk UPDATE/DELETE statements bypass these hooks: call
+# user_cache.invalidate() yourself after those.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    if target.id is not None:
+        user_cache.invalidate(target.id)
+
+
+# =========================
+# TOKEN
+# =========================
+class Principal:
+    """
+    Who is calling, as far as role checks need to know.
+    email is only filled in when the user row was loaded.
+    """
+    __slots__ = ("id", "role", "email")
+
+    def __init__(self, id: int, role: str, email: Optional[str] = None):
+        self.id = id
+        self.role = role
+        self.email = email
+
+
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
             raise JWTError()
-        user_id = int(user_id)
+        payload["sub"] = int(user_id)
     except (JWTError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+
+def load_user(user_id: int) -> User:
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
 
-    # ✅ CORRECT session usage
     with get_session() as session:
         user = session.get(User, user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
+        user_cache.put(user)
         return user
 
 
+# =========================
+# GET CURRENT USER
+# =========================
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    return load_user(decode_token(token)["sub"])
+
+
+def get_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Fast path for role checks: a recently issued token's signed "role"
+    claim is used as-is, with no user lookup. Older tokens, tokens
+    without iat/role, and users changed since the token was issued go
+    through the cached user row instead.
+    """
+    claims = decode_token(token)
+    user_id = claims["sub"]
+    role = claims.get("role")
+    issued_at = claims.get("iat")
+
+    if (
+        role
+        and isinstance(issued_at, (int, float))
+        and time.time() - issued_at <= CLAIMS_TRUST_SECONDS
+        and not user_cache.changed_since(user_id, issued_at)
+    ):
+        return Principal(user_id, role)
+
+    user = load_user(user_id)
+    return Principal(user.id, user.role, user.email)
+
+
 # =========================
 # REQUIRE ADMIN
 # =========================
-def require_admin(user: User = Depends(get_current_user)) -> User:
-    if user.role != "admin":
+def require_admin(principal: Principal = Depends(get_principal)) -> Principal:
+    if principal.role != "admin":
         raise HTTPException(status_code=403, detail="Admin only")
-    return user
+    return principal
 
 
 # =========================
 # REQUIRE APPLICANT
 # =========================
-def require_applicant(user: User = Depends(get_current_user)) -> User:
-    if user.role != "applicant":
+def require_applicant(principal: Principal = Depends(get_principal)) -> Principal:
+    if principal.role != "applicant":
         raise HTTPException(status_code=403, detail="Applicant only")
-    return user
+    return principal
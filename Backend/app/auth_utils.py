@@ -1,5 +1,12 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 
@@ -7,7 +14,14 @@ SECRET_KEY = "supersecretkey-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; changing it re-hashes each password on its next login
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# Processes doing bcrypt work, and how many hash/verify calls may be
+# running or waiting for them before new ones are turned away
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", "32"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -15,8 +29,84 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    (matches, new hash or None). A new hash is returned when the stored
+    one was made with different settings (e.g. BCRYPT_ROUNDS changed).
+    """
+    return pwd_context.verify_and_update(password, hashed)
+
 def create_token(data: dict):
     to_encode = data.copy()
+    # Issue time lets auth_helpers decide how far to trust the claims
+    to_encode.setdefault("iat", int(time.time()))
     token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return token
 
+
+# =========================
+# PASSWORD WORKER POOL
+# =========================
+class PasswordPoolBusy(Exception):
+    pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_inflight = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads (job workers, LLM
+            # client loop) that must not be forked mid-lock
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+async def _run_in_pool(fn, *args):
+    """
+    Run fn(*args) in the password pool without holding an API thread.
+    Raises PasswordPoolBusy when PASSWORD_QUEUE_LIMIT calls are already
+    pending, so a login storm cannot build an unbounded backlog.
+    """
+    global _inflight, _pool
+    with _pool_lock:
+        if _inflight >= PASSWORD_QUEUE_LIMIT:
+            raise PasswordPoolBusy()
+        _inflight += 1
+
+    try:
+        pool = _get_pool()
+        try:
+            return await asyncio.wrap_future(pool.submit(fn, *args))
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed): start a fresh pool next call
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            raise
+    finally:
+        with _pool_lock:
+            _inflight -= 1
+
+
+async def ahash_password(password: str) -> str:
+    return await _run_in_pool(hash_password, password)
+
+
+async def averify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run_in_pool(verify_and_update, password, hashed)
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
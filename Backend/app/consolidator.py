@@ -1,45 +1,242 @@
 # backend/app/consolidator.py
-from docx import Document
+import os
+import json
+import time
 import uuid
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-OUT_DIR = Path(__file__).resolve().parents[1] / "out"
-OUT_DIR.mkdir(exist_ok=True)
+from .metrics import OPERATION_SECONDS, log_event
 
+OUT_DIR = Path(os.environ.get("PROPOSAL_DIR") or Path(__file__).resolve().parents[1] / "out")
+OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def make_proposal(
+# Optional .docx whose styles/letterhead every proposal starts from
+PROPOSAL_TEMPLATE = os.environ.get("PROPOSAL_TEMPLATE") or None
+# Rendering is CPU-bound python-docx work: it runs in its own processes
+PROPOSAL_WORKERS = int(os.environ.get("PROPOSAL_WORKERS", "2"))
+PROPOSAL_TIMEOUT = float(os.environ.get("PROPOSAL_TIMEOUT", "300"))
+
+# Retention: proposals unused for this long, or past the newest
+# PROPOSAL_MAX_FILES, are deleted (a re-run renders them again)
+PROPOSAL_RETENTION_DAYS = float(os.environ.get("PROPOSAL_RETENTION_DAYS", "30"))
+PROPOSAL_MAX_FILES = int(os.environ.get("PROPOSAL_MAX_FILES", "5000"))
+PROPOSAL_PRUNE_INTERVAL = float(os.environ.get("PROPOSAL_PRUNE_INTERVAL", "3600"))
+
+# Bump when the rendered layout changes, so cached files are redone
+RENDER_VERSION = 1
+
+
+# ---------------------------
+# Rendering (runs in the worker processes)
+# ---------------------------
+_template = None
+
+
+def _init_worker(template_path: Optional[str]) -> None:
+    # Parsed once per worker, not once per proposal
+    global _template
+    from docx import Document
+    _template = Document(template_path) if template_path else Document()
+
+
+def _render(
+    path: str,
     requirements: List[Dict[str, Any]],
     applicant_info: Dict[str, Any],
-    pricing: Dict[str, Any]
-) -> str:
-    doc = Document()
+    pricing: Dict[str, Any],
+) -> Tuple[str, float]:
+    """
+    Append the proposal to the parsed template, save it, then strip the
+    appended elements again so the next proposal starts from the clean
+    template. (copy.deepcopy of a python-docx Document saves the original.)
+    Returns (path, render seconds).
+    """
+    started = time.perf_counter()
+    doc = _template
+    body = doc.element.body
+    original = list(body)
+    template_ids = {id(el) for el in original}
+
+    try:
+        # Header
+        doc.add_heading("Proposal", level=1)
+        doc.add_paragraph(f"Applicant: {applicant_info.get('name', 'Unknown')}")
+
+        # Requirements
+        doc.add_heading("Requirements", level=2)
+        for r in requirements:
+            text = r.get("text", "")
+            doc.add_paragraph(text)
+
+        # Pricing
+        doc.add_heading("Pricing", level=2)
+        for li in pricing.get("line_items", []):
+            sku = li.get("sku", "UNKNOWN")
+            qty = li.get("qty", 1)
+            amount = li.get("amount", 0)
+            doc.add_paragraph(f"{sku} x {qty}: {amount}")
+
+        total = pricing.get("total", 0)
+        doc.add_paragraph(f"Total: {total}")
+
+        # Readers never see a half-written file
+        tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            doc.save(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    finally:
+        for el in list(body):
+            if id(el) not in template_ids:
+                body.remove(el)
+
+    return path, time.perf_counter() - started
+
+
+# ---------------------------
+# Pool + content-addressed output
+# ---------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PROPOSAL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(PROPOSAL_TEMPLATE,),
+            )
+        return _pool
+
+
+def shutdown_proposal_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    # Header
-    doc.add_heading("Proposal", level=1)
-    doc.add_paragraph(f"Applicant: {applicant_info.get('name', 'Unknown')}")
 
-    # Requirements
-    doc.add_heading("Requirements", level=2)
-    for r in requirements:
-        text = r.get("text", "")
-        doc.add_paragraph(text)
+_template_sha: Optional[str] = None
 
-    # Pricing
-    doc.add_heading("Pricing", level=2)
-    for li in pricing.get("line_items", []):
-        sku = li.get("sku", "UNKNOWN")
-        qty = li.get("qty", 1)
-        amount = li.get("amount", 0)
-        doc.add_paragraph(f"{sku} x {qty}: {amount}")
 
-    total = pricing.get("total", 0)
-    doc.add_paragraph(f"Total: {total}")
+def _template_hash() -> str:
+    # Read once, like the workers' parsed copy: template edits need a restart
+    global _template_sha
+    if _template_sha is None:
+        _template_sha = ""
+        if PROPOSAL_TEMPLATE:
+            with open(PROPOSAL_TEMPLATE, "rb") as f:
+                _template_sha = hashlib.sha256(f.read()).hexdigest()
+    return _template_sha
 
-    # Filename
-    fname = OUT_DIR / f"proposal_{uuid.uuid4().hex}.docx"
 
-    # FIX: Convert Path → str for Pylance + python-docx
-    doc.save(str(fname))
+def proposal_path(
+    requirements: List[Dict[str, Any]],
+    applicant_info: Dict[str, Any],
+    pricing: Dict[str, Any],
+) -> Path:
+    key = hashlib.sha256(
+        json.dumps(
+            [requirements, applicant_info, pricing, _template_hash(), RENDER_VERSION],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+    return OUT_DIR / f"proposal_{key}.docx"
+
+
+def prune_proposals(
+    max_age_days: float = PROPOSAL_RETENTION_DAYS,
+    max_files: int = PROPOSAL_MAX_FILES,
+) -> int:
+    """
+    Delete proposals not used for max_age_days, then the least recently
+    used beyond max_files. Returns how many were removed.
+    """
+    files = []
+    for p in OUT_DIR.glob("proposal_*.docx"):
+        try:
+            files.append((p.stat().st_mtime, p))
+        except FileNotFoundError:
+            continue
+    files.sort(reverse=True)
+
+    cutoff = time.time() - max_age_days * 86400
+    doomed = [p for i, (mtime, p) in enumerate(files) if mtime < cutoff or i >= max_files]
+
+    for p in doomed:
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+    return len(doomed)
 
-    return str(fname)
+
+def _maybe_prune() -> None:
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < PROPOSAL_PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    removed = prune_proposals()
+    if removed:
+        log_event("proposals_pruned", removed=removed)
+
+
+def submit_proposal(
+    requirements: List[Dict[str, Any]],
+    applicant_info: Dict[str, Any],
+    pricing: Dict[str, Any]
+) -> Future:
+    """
+    Render in the worker pool; the Future resolves to the file path.
+    Output is named by content hash, so an unchanged proposal resolves
+    immediately to the existing file.
+    """
+    _maybe_prune()
+    path = proposal_path(requirements, applicant_info, pricing)
+
+    if path.exists():
+        # Mark as recently used for the retention policy
+        os.utime(path)
+        done: Future = Future()
+        done.set_result(str(path))
+        return done
+
+    rendering = _get_pool().submit(_render, str(path), requirements, applicant_info, pricing)
+    result: Future = Future()
+
+    def _rendered(fut: Future) -> None:
+        # Render time is measured in the worker, without pool queueing
+        if fut.cancelled():
+            result.cancel()
+        elif fut.exception() is not None:
+            result.set_exception(fut.exception())
+        else:
+            out_path, seconds = fut.result()
+            OPERATION_SECONDS.observe(seconds, op="docx")
+            result.set_result(out_path)
+
+    rendering.add_done_callback(_rendered)
+    return result
+
+
+def make_proposal(
+    requirements: List[Dict[str, Any]],
+    applicant_info: Dict[str, Any],
+    pricing: Dict[str, Any]
+) -> str:
+    return submit_proposal(requirements, applicant_info, pricing).result(timeout=PROPOSAL_TIMEOUT)
@@ -0,0 +1,224 @@
+# backend/app/embeddings.py
+import os
+import time
+import hashlib
+import numpy as np
+import requests
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+
+from .db import engine, get_session
+from .models import EmbeddingCache
+from .metrics import OPERATION_SECONDS
+
+# ---------------------------
+# Backend selection
+# ---------------------------
+# mock                  : deterministic MD5 vectors, no model needed (default)
+# ollama                : local Ollama /api/embeddings (or any stub serving it)
+# sentence-transformers : local CPU model via the sentence-transformers package
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "mock").lower()
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "nomic-embed-text")
+EMBED_DIM = int(os.environ.get("EMBED_DIM", "16"))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+EMBED_TIMEOUT = int(os.environ.get("EMBED_TIMEOUT", "60"))
+
+OLLAMA_BASE = os.environ.get("OLLAMA_BASE", "http://localhost:11434")
+OLLAMA_EMBEDDINGS = f"{OLLAMA_BASE}/api/embeddings"
+
+# SQLite IN (...) lists are capped, so cache lookups go in slices
+_CACHE_LOOKUP_CHUNK = 500
+
+
+class MockBackend:
+    """
+    Deterministic lightweight embedding (mock). Safe for FAISS testing.
+    """
+    name = "mock"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _one(self, text: str) -> List[float]:
+        out: List[float] = []
+        block = 0
+        while len(out) < self.dim:
+            seed = text if block == 0 else f"{text}\x00{block}"
+            out.extend(b / 255 for b in hashlib.md5(seed.encode()).digest())
+            block += 1
+        return out[: self.dim]
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        return [self._one(t) for t in texts]
+
+
+class OllamaBackend:
+    name = "ollama"
+
+    def __init__(self, dim: int, model: str = EMBED_MODEL, url: str = OLLAMA_EMBEDDINGS):
+        self.dim = dim
+        self.model = model
+        self.url = url
+        # Keep-alive connection reused across the whole batch
+        self.http = requests.Session()
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        out = []
+        for text in texts:
+            r = self.http.post(
+                self.url,
+                json={"model": self.model, "prompt": text},
+                timeout=EMBED_TIMEOUT,
+            )
+            r.raise_for_status()
+            out.append(r.json()["embedding"])
+        return out
+
+
+class SentenceTransformerBackend:
+    name = "sentence-transformers"
+
+    def __init__(self, dim: int, model: str = EMBED_MODEL):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBED_BACKEND=sentence-transformers needs the "
+                "sentence-transformers package installed"
+            ) from e
+
+        self.dim = dim
+        self.model = model
+        self._model = SentenceTransformer(model, device="cpu")
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        vecs = self._model.encode(
+            texts,
+            batch_size=EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vecs.astype("float32").tolist()
+
+
+BACKENDS = {
+    "mock": MockBackend,
+    "ollama": OllamaBackend,
+    "sentence-transformers": SentenceTransformerBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if EMBED_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown EMBED_BACKEND: {EMBED_BACKEND}")
+        _backend = BACKENDS[EMBED_BACKEND](EMBED_DIM)
+    return _backend
+
+
+def cache_key(text: str, backend_name: str = EMBED_BACKEND, model: str = EMBED_MODEL) -> str:
+    """
+    Content hash of the text plus everything that changes its vector.
+    """
+    if backend_name == "mock":
+        model = ""
+    h = hashlib.sha256(f"{backend_name}:{model}:{EMBED_DIM}\n".encode())
+    h.update((text or "").encode())
+    return h.hexdigest()
+
+
+def _cache_get(keys: List[str]) -> Dict[str, List[float]]:
+    found: Dict[str, List[float]] = {}
+    with get_session() as session:
+        for i in range(0, len(keys), _CACHE_LOOKUP_CHUNK):
+            chunk = keys[i:i + _CACHE_LOOKUP_CHUNK]
+            rows = session.exec(
+                select(EmbeddingCache).where(EmbeddingCache.key.in_(chunk))
+            ).all()
+            for row in rows:
+                if row.dim == EMBED_DIM:
+                    found[row.key] = np.frombuffer(row.vector, dtype="float32").tolist()
+    return found
+
+
+def _cache_put(items: Dict[str, List[float]], model: str) -> None:
+    """
+    One INSERT ... ON CONFLICT (key) DO NOTHING for the whole batch: no
+    per-key SELECT, and a key another worker cached meanwhile is kept.
+    """
+    if not items:
+        return
+
+    # Core insert: the model's default_factory does not run
+    now = datetime.utcnow()
+    rows = [
+        {
+            "key": key,
+            "model": model,
+            "dim": len(vec),
+            "vector": np.asarray(vec, dtype="float32").tobytes(),
+            "created_at": now,
+        }
+        for key, vec in items.items()
+    ]
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(EmbeddingCache).on_conflict_do_nothing(index_elements=["key"])
+
+    with get_session() as session:
+        session.execute(stmt, rows)
+        session.commit()
+
+
+def embed_batch(texts: List[str], use_cache: Optional[bool] = None) -> List[List[float]]:
+    """
+    Embed many texts, in EMBED_BATCH_SIZE slices. Vectors already in the
+    SQLite cache are not recomputed. The mock backend skips the cache
+    (hashing is cheaper than the lookup).
+    """
+    if not texts:
+        return []
+
+    started = time.perf_counter()
+    backend = get_backend()
+    if use_cache is None:
+        use_cache = backend.name != "mock"
+
+    texts = [t or "" for t in texts]
+    keys = [cache_key(t, backend.name) for t in texts]
+    vectors: Dict[str, List[float]] = _cache_get(list(set(keys))) if use_cache else {}
+
+    # Dedup within the batch too
+    todo: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            todo.setdefault(key, text)
+
+    todo_keys = list(todo)
+    for i in range(0, len(todo_keys), EMBED_BATCH_SIZE):
+        batch_keys = todo_keys[i:i + EMBED_BATCH_SIZE]
+        encoded = backend.encode([todo[k] for k in batch_keys])
+
+        fresh = {}
+        for key, vec in zip(batch_keys, encoded):
+            if len(vec) != EMBED_DIM:
+                raise ValueError(
+                    f"{backend.name} returned {len(vec)}-dim vectors, "
+                    f"EMBED_DIM is {EMBED_DIM}"
+                )
+            fresh[key] = [float(x) for x in vec]
+
+        vectors.update(fresh)
+        if use_cache:
+            _cache_put(fresh, getattr(backend, "model", backend.name))
+
+    OPERATION_SECONDS.observe(time.perf_counter() - started, op="embed")
+    return [vectors[k] for k in keys]
+
+
+def embed_text(text: str) -> List[float]:
+    return embed_batch([text])[0]
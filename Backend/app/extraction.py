@@ -0,0 +1,223 @@
+# backend/app/extraction.py
+import os
+import re
+import codecs
+import hashlib
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+from xml.etree import ElementTree
+
+from . import storage
+from .metrics import log_event
+
+# Parsing is CPU-bound (pure-Python PDF decoding): it runs in its own
+# process pool so pipeline threads and the API keep their GIL share.
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "2"))
+# Stop after this much text per file; the LLM never sees more anyway
+EXTRACT_MAX_CHARS = int(os.environ.get("EXTRACT_MAX_CHARS", "2000000"))
+EXTRACT_TIMEOUT = float(os.environ.get("EXTRACT_TIMEOUT", "600"))
+
+# Bump when extraction output changes, so cached text is redone
+EXTRACTOR_VERSION = 1
+
+TEXT_DIR = os.path.join(storage.UPLOAD_DIR, "text")
+os.makedirs(TEXT_DIR, exist_ok=True)
+
+_HASH_CHUNK = 1024 * 1024
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+KINDS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".txt": "txt",
+    ".md": "txt",
+    ".csv": "txt",
+}
+
+
+class ExtractionError(RuntimeError):
+    """
+    An attachment could not be read (missing, timed out, parser crash).
+    Raised so the pipeline job is retried instead of checkpointing the
+    tender without that file's text.
+    """
+
+
+def kind_for(filename: str) -> Optional[str]:
+    return KINDS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _clean(text: str) -> str:
+    text = re.sub(r"[ \t\r\f\v]+", " ", text or "")
+    return re.sub(r"\n\s*\n+", "\n\n", text).strip()
+
+
+# ---------------------------
+# Page iterators (run in the worker processes)
+# ---------------------------
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("PDF extraction needs the pypdf package installed") from e
+
+    # PdfReader parses page objects lazily, one at a time
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_docx_pages(path: str, paragraphs_per_page: int = 50) -> Iterator[str]:
+    """
+    Stream paragraphs out of word/document.xml with iterparse, freeing
+    each element once read (python-docx would build the whole tree).
+    DOCX has no stored pages: every N paragraphs count as one.
+    """
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as xml:
+        buf: List[str] = []
+        for _, el in ElementTree.iterparse(xml, events=("end",)):
+            if el.tag != f"{_W}p":
+                continue
+            text = "".join(t.text or "" for t in el.iter(f"{_W}t"))
+            el.clear()
+            if text.strip():
+                buf.append(text)
+            if len(buf) >= paragraphs_per_page:
+                yield "\n".join(buf)
+                buf = []
+        if buf:
+            yield "\n".join(buf)
+
+
+def iter_txt_pages(path: str, chunk_chars: int = 64 * 1024) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_chars), b""):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+
+PAGE_ITERATORS = {
+    "pdf": iter_pdf_pages,
+    "docx": iter_docx_pages,
+    "txt": iter_txt_pages,
+}
+
+
+def extract_to_file(path: str, kind: str, out_path: str, max_chars: int) -> int:
+    """
+    Write the text of path to out_path one page at a time; memory stays
+    at one page whatever the document size. Returns characters written.
+    """
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    written = 0
+    try:
+        with open(tmp, "w", encoding="utf-8") as out:
+            for page in PAGE_ITERATORS[kind](path):
+                # Plain text chunks are not pages: keep their whitespace
+                text = page if kind == "txt" else _clean(page)
+                if not text:
+                    continue
+                if written:
+                    out.write("" if kind == "txt" else "\n\n")
+                text = text[: max_chars - written]
+                out.write(text)
+                written += len(text)
+                if written >= max_chars:
+                    break
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return written
+
+
+# ---------------------------
+# Pool + cache (pipeline side)
+# ---------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_extract_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def text_cache_path(sha256: str) -> str:
+    return os.path.join(TEXT_DIR, f"{sha256}.v{EXTRACTOR_VERSION}.txt")
+
+
+def extract_documents(names: List[str]) -> str:
+    """
+    Text of the stored files (see storage) in order, joined by blank
+    lines. Files are parsed in parallel in the worker pool; text is
+    cached on disk by file hash, so a file seen before (by any tender)
+    is not parsed again. Unsupported file types are skipped; a file that
+    is missing or fails to parse raises ExtractionError once the others
+    are done (their text stays cached for the retry).
+    """
+    jobs = []
+    failed = []
+    for name in names:
+        found = storage.resolve(name)
+        if found is None:
+            failed.append(f"{name}: file not found")
+            continue
+        kind = kind_for(found["filename"])
+        if kind is None:
+            log_event("attachment_skipped", name=name, reason="unsupported type")
+            continue
+
+        sha = found["sha256"] or file_sha256(found["path"])
+        out_path = text_cache_path(sha)
+        if os.path.exists(out_path):
+            jobs.append((name, out_path, None))
+        else:
+            fut = _get_pool().submit(
+                extract_to_file, found["path"], kind, out_path, EXTRACT_MAX_CHARS
+            )
+            jobs.append((name, out_path, fut))
+
+    parts = []
+    for name, out_path, fut in jobs:
+        if fut is not None:
+            try:
+                fut.result(timeout=EXTRACT_TIMEOUT)
+            except Exception as e:
+                failed.append(f"{name}: {type(e).__name__}: {e}")
+                continue
+
+        with open(out_path, encoding="utf-8") as f:
+            text = f.read()
+        if text.strip():
+            parts.append(text)
+
+    if failed:
+        raise ExtractionError(f"{len(failed)} of {len(names)} attachments failed: " + "; ".join(failed))
+    return "\n\n".join(parts)
@@ -0,0 +1,223 @@
+# backend/app/jobs.py
+import os
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import update
+from sqlmodel import select
+
+from .db import get_session
+from .models import Job, Tender
+from .pipeline import run_pipeline
+from .metrics import log_event
+
+# Local LLM throughput is the bottleneck: keep the pool small
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", "300"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "2"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# kind -> callable(tender_id)
+HANDLERS: Dict[str, Callable[[int], None]] = {
+    "pipeline": run_pipeline,
+}
+
+
+def job_to_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "tender_id": job.tender_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff: base, 2*base, 4*base, ... capped.
+    """
+    return min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+
+
+class JobQueue:
+    """
+    DB-backed job queue with a bounded pool of worker threads.
+
+    Jobs survive restarts (the job table is the queue); at most one
+    queued/running job exists per (kind, tender).
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._enqueue_lock = threading.Lock()
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def start(self) -> None:
+        if self._threads:
+            return
+
+        self._recover()
+        self._stop.clear()
+
+        for n in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _recover(self) -> None:
+        # Jobs left "running" by a crashed process go back in the queue
+        with get_session() as session:
+            session.execute(
+                update(Job)
+                .where(Job.status == "running")
+                .values(status="queued", run_after=datetime.utcnow())
+            )
+            session.commit()
+
+    # ---------------------------
+    # Producer side
+    # ---------------------------
+    def enqueue(self, tender_id: int, kind: str = "pipeline") -> dict:
+        """
+        Queue a job, or return the job already queued/running for
+        this tender.
+        """
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        with self._enqueue_lock, get_session() as session:
+            existing = session.exec(
+                select(Job)
+                .where(Job.tender_id == tender_id)
+                .where(Job.kind == kind)
+                .where(Job.status.in_(ACTIVE_STATUSES))
+            ).first()
+
+            if existing:
+                return job_to_dict(existing)
+
+            job = Job(kind=kind, tender_id=tender_id, max_attempts=JOB_MAX_ATTEMPTS)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            out = job_to_dict(job)
+
+        self._wake.set()
+        return out
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with get_session() as session:
+            job = session.get(Job, job_id)
+            return job_to_dict(job) if job else None
+
+    def latest_for_tender(self, tender_id: int) -> Optional[dict]:
+        with get_session() as session:
+            job = session.exec(
+                select(Job)
+                .where(Job.tender_id == tender_id)
+                .order_by(Job.id.desc())
+            ).first()
+            return job_to_dict(job) if job else None
+
+    # ---------------------------
+    # Worker side
+    # ---------------------------
+    def _claim(self) -> Optional[int]:
+        now = datetime.utcnow()
+        with get_session() as session:
+            candidates = session.exec(
+                select(Job.id)
+                .where(Job.status == "queued")
+                .where(Job.run_after <= now)
+                .order_by(Job.run_after, Job.id)
+                .limit(self.workers)
+            ).all()
+
+            for job_id in candidates:
+                # Conditional update: only one worker wins a given job
+                res = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id)
+                    .where(Job.status == "queued")
+                    .values(status="running", started_at=now, attempts=Job.attempts + 1)
+                )
+                session.commit()
+                if res.rowcount == 1:
+                    return job_id
+
+        return None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            job_id = self._claim()
+            if job_id is None:
+                self._wake.wait(JOB_POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self._run(job_id)
+
+    def _run(self, job_id: int) -> None:
+        with get_session() as session:
+            job = session.get(Job, job_id)
+            kind, tender_id = job.kind, job.tender_id
+
+        try:
+            HANDLERS[kind](tender_id)
+        except Exception as e:
+            log_event(
+                "job_failed", job_id=job_id, kind=kind, tender_id=tender_id,
+                error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(),
+            )
+            self._fail(job_id, f"{type(e).__name__}: {e}")
+            return
+
+        with get_session() as session:
+            job = session.get(Job, job_id)
+            job.status = "done"
+            job.last_error = None
+            job.finished_at = datetime.utcnow()
+            session.commit()
+
+    def _fail(self, job_id: int, error: str) -> None:
+        with get_session() as session:
+            job = session.get(Job, job_id)
+            job.last_error = error[:2000]
+
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+            else:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+
+                tender = session.get(Tender, job.tender_id)
+                if tender is not None:
+                    tender.pipeline_status = "failed"
+
+            session.commit()
+
+
+# Process-wide queue, started from main.startup
+job_queue = JobQueue()
@@ -0,0 +1,252 @@
+# backend/app/llm.py
+import os
+import json
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+
+import httpx
+
+from .metrics import observe_llm
+
+# Works inside Docker (service name = "ollama") and locally (localhost)
+OLLAMA_BASE = os.environ.get("OLLAMA_BASE", "http://localhost:11434")
+MODEL = os.environ.get("OLLAMA_MODEL", "phi3:mini")
+
+# How many generations may run on the local model at once
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "2"))
+# Keep-alive connections kept open to Ollama
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "10"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "120"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+
+
+class OllamaClient:
+    """
+    Shared Ollama client.
+
+    One httpx.AsyncClient (pooled keep-alive connections) and one
+    semaphore capping in-flight generations, both living on a private
+    event loop thread. Sync callers (pipeline workers) block on
+    generate(); async callers (routes) await agenerate(), and cancelling
+    that await cancels the HTTP request.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE,
+        model: str = MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        pool_size: int = LLM_POOL_SIZE,
+        timeout: float = LLM_TIMEOUT,
+    ):
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="ollama-client", daemon=True
+                )
+                thread.start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    async def _setup(self) -> None:
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=LLM_CONNECT_TIMEOUT),
+        )
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+
+            if self._http is not None:
+                asyncio.run_coroutine_threadsafe(self._http.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(5)
+            self._http, self._sem, self._thread = None, None, None
+
+    def _submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    # ---------------------------
+    # Requests (run on the client loop)
+    # ---------------------------
+    async def _generate(self, prompt: str, timeout: Optional[float], options: Dict[str, Any]) -> str:
+        assert self._http is not None and self._sem is not None
+
+        payload = {"model": self.model, "prompt": prompt, "stream": False, **options}
+        started = time.perf_counter()
+        queued, outcome, data = 0.0, "error", None
+        try:
+            async with self._sem:
+                queued = time.perf_counter() - started
+                r = await self._http.post(
+                    "/api/generate",
+                    json=payload,
+                    timeout=httpx.Timeout(timeout or self.timeout, connect=LLM_CONNECT_TIMEOUT),
+                )
+                r.raise_for_status()
+                data = r.json()
+                outcome = "ok"
+                return data.get("response", "")
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            observe_llm("generate", outcome, time.perf_counter() - started, queued, data)
+
+    async def _stream(
+        self,
+        prompt: str,
+        timeout: Optional[float],
+        options: Dict[str, Any],
+        emit,
+    ) -> None:
+        """
+        Read Ollama's NDJSON stream, calling emit(text) per token chunk.
+        """
+        assert self._http is not None and self._sem is not None
+
+        payload = {"model": self.model, "prompt": prompt, "stream": True, **options}
+        started = time.perf_counter()
+        queued, outcome, final = 0.0, "error", None
+        try:
+            async with self._sem:
+                queued = time.perf_counter() - started
+                async with self._http.stream(
+                    "POST",
+                    "/api/generate",
+                    json=payload,
+                    timeout=httpx.Timeout(timeout or self.timeout, connect=LLM_CONNECT_TIMEOUT),
+                ) as r:
+                    r.raise_for_status()
+                    async for line in r.aiter_lines():
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("response"):
+                            emit(chunk["response"])
+                        if chunk.get("done"):
+                            # The final chunk carries the token counts
+                            final = chunk
+                            break
+            outcome = "ok"
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            observe_llm("stream", outcome, time.perf_counter() - started, queued, final)
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def generate(self, prompt: str, timeout: Optional[float] = None, **options) -> str:
+        """
+        Blocking generation, for worker threads.
+        """
+        return self._submit(self._generate(prompt, timeout, options)).result()
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None, **options) -> str:
+        """
+        Non-blocking generation, awaitable from any event loop.
+        """
+        fut = self._submit(self._generate(prompt, timeout, options))
+        # wrap_future propagates cancellation back to the client loop
+        return await asyncio.wrap_future(fut)
+
+    async def astream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        **options,
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text chunks as they arrive. Closing the
+        iterator early (e.g. client disconnect) aborts the request.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        end = object()
+
+        def put(item) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # consumer loop already closed
+
+        async def produce() -> None:
+            try:
+                await self._stream(prompt, timeout, options, put)
+            except Exception as e:
+                put(e)
+            finally:
+                put(end)
+
+        fut = self._submit(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            fut.cancel()
+
+
+async def cancel_on_disconnect(request, coro: Awaitable, poll_seconds: float = 0.5):
+    """
+    Await coro, cancelling it if the HTTP client goes away first.
+    Raises asyncio.CancelledError in that case.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise asyncio.CancelledError("client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# Process-wide client, started lazily on first use
+ollama = OllamaClient()
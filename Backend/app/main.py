@@ -3,6 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .routes import register_all_routes
 from .db import init_db
+from . import matcher
+from .jobs import job_queue
+from .llm import ollama
+from .auth_utils import shutdown_password_pool
+from .extraction import shutdown_extract_pool
+from .consolidator import shutdown_proposal_pool
+from .pagination import NEXT_CURSOR_HEADER
+from .metrics import MetricsMiddleware, log_event
 
 app = FastAPI(title="RFP Prototype Backend")
 
@@ -15,8 +23,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser read the keyset pagination cursor
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# ---------------------------
+# METRICS
+# ---------------------------
+# Added last so it wraps CORS and times the whole request
+app.add_middleware(MetricsMiddleware)
+
 # ---------------------------
 # STARTUP
 # ---------------------------
@@ -27,7 +43,26 @@ def startup():
         from .seed_sku import seed
         seed()
     except Exception as e:
-        print("Seed failed:", e)
+        log_event("seed_failed", error=f"{type(e).__name__}: {e}")
+
+    # Load the SKU vector index once; it is served from memory afterwards
+    try:
+        matcher.warm_index()
+    except Exception as e:
+        log_event("index_warmup_failed", error=f"{type(e).__name__}: {e}")
+
+    # Background pipeline workers
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    job_queue.stop()
+    ollama.close()
+    shutdown_password_pool()
+    shutdown_extract_pool()
+    shutdown_proposal_pool()
+    matcher.sku_index.snapshot()
 
 # ---------------------------
 # REGISTER ROUTERS
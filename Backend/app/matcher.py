@@ -1,29 +1,521 @@
 # backend/app/matcher.py
+import os
+import time
 import faiss
+import json
+import hashlib
+import threading
 import numpy as np
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
+from sqlmodel import select
+
+from .db import get_session
+from .models import SKU
+from . import ai_agent
+from .embeddings import EMBED_DIM, cache_key
+from .metrics import OPERATION_SECONDS, log_event
 
 # Store index inside /app/app/ so it survives volume mount
-INDEX_FILE = Path(__file__).resolve().parent / "faiss.index"
-VECTOR_DIM = 16
+INDEX_FILE = Path(
+    os.environ.get("FAISS_INDEX_FILE") or Path(__file__).resolve().parent / "faiss.index"
+)
+VECTOR_DIM = EMBED_DIM
+
+# ---------------------------
+# Index type / ANN knobs
+# ---------------------------
+# flat  : exact brute force (default)
+# ivf   : IVFFlat, inverted lists, tuned by FAISS_NPROBE
+# hnsw  : HNSW graph, tuned by FAISS_EF_SEARCH
+# ivfpq : IVF + product quantization, smallest memory footprint
+INDEX_KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat").lower()
+
+IVF_NLIST = int(os.environ.get("FAISS_NLIST", "1024"))
+IVF_NPROBE = int(os.environ.get("FAISS_NPROBE", "16"))
+HNSW_M = int(os.environ.get("FAISS_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("FAISS_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH", "64"))
+PQ_M = int(os.environ.get("FAISS_PQ_M", "8"))  # must divide VECTOR_DIM
+PQ_NBITS = 8
+
+# Scoring metric:
+# cosine : inner product over L2-normalized vectors, higher is better (default)
+# l2     : raw L2 distance, lower is better (pre-similarity behaviour)
+METRICS = ("cosine", "l2")
+METRIC = os.environ.get("FAISS_METRIC", "cosine").lower()
+
+# Cosine matches below this similarity are dropped before pricing
+MIN_SIMILARITY = float(os.environ.get("MATCH_MIN_SIMILARITY", "0.5"))
+
+# Below this many vectors exact search is fast enough and ANN training
+# would be unreliable, so the flat index is used whatever INDEX_TYPE says
+MIN_TRAIN_SIZE = int(os.environ.get("FAISS_MIN_TRAIN_SIZE", "1000"))
+
+
+def content_hash(text: str) -> str:
+    # Covers backend/model/dim too, so switching embedders re-embeds SKUs
+    return cache_key(text)
 
 
-def build_index(vectors: List[List[float]]) -> None:
+def effective_kind(kind: str, n: int) -> str:
     """
-    Build FAISS index from a list of embedding vectors.
+    Index kind actually used for a catalog of n vectors.
     """
-    if not vectors:
-        print("No vectors provided, FAISS index not created")
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown FAISS index type: {kind}")
+
+    if kind == "flat" or n < MIN_TRAIN_SIZE:
+        return "flat"
+    if kind == "ivfpq" and n < 2 ** PQ_NBITS:
+        return "flat"
+    return kind
+
+
+def faiss_metric(metric: str) -> int:
+    if metric not in METRICS:
+        raise ValueError(f"Unknown FAISS metric: {metric}")
+    return faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+
+
+def prepare_vectors(vectors, dim: int, metric: str) -> np.ndarray:
+    """
+    float32 (n, dim) matrix, L2-normalized in cosine mode.
+    """
+    x = np.array(vectors, dtype="float32").reshape(-1, dim)
+    if metric == "cosine" and len(x):
+        faiss.normalize_L2(x)
+    return x
+
+
+def make_index(
+    kind: str,
+    dim: int,
+    train_vectors: Optional[np.ndarray] = None,
+    metric: str = METRIC,
+):
+    """
+    Index factory. IVF kinds are trained on train_vectors and keep SKU
+    ids natively; flat and HNSW are wrapped in an IndexIDMap2.
+    """
+    mt = faiss_metric(metric)
+
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlat(dim, mt))  # type: ignore
+
+    if kind == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, HNSW_M, mt)
+        base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        base.hnsw.efSearch = HNSW_EF_SEARCH
+        return faiss.IndexIDMap2(base)  # type: ignore
+
+    if kind in ("ivf", "ivfpq"):
+        if train_vectors is None or len(train_vectors) == 0:
+            raise ValueError(f"{kind} index needs training vectors")
+
+        # ~39 points per centroid is the FAISS training minimum
+        nlist = max(1, min(IVF_NLIST, len(train_vectors) // 39))
+        quantizer = faiss.IndexFlat(dim, mt)
+
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, mt)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS, mt)
+
+        index.train(train_vectors)  # type: ignore[call-arg]
+        index.nprobe = min(IVF_NPROBE, nlist)
+        # Hashtable direct map keeps remove_ids/reconstruct working by SKU id
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+
+    raise ValueError(f"Unknown FAISS index type: {kind}")
+
+
+def _base_index(index):
+    base = index.index if isinstance(index, faiss.IndexIDMap) else index
+    return faiss.downcast_index(base)
+
+
+def index_kind(index) -> str:
+    base = _base_index(index)
+
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_metric(index) -> str:
+    return "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def set_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    base = _base_index(index)
+
+    if nprobe is not None and isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    if ef_search is not None and isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+
+
+class SKUIndex:
+    """
+    Long-lived in-memory FAISS index keyed by SKU id.
+
+    Loaded once at startup, updated incrementally as SKUs change and
+    served from memory. Disk is only touched for snapshots; a snapshot
+    written by another process (the catalog importer) is picked up by
+    ensure_index().
+
+    In cosine mode scores are similarities in [-1, 1] (higher is better);
+    in l2 mode they are squared L2 distances (lower is better).
+    """
+
+    def __init__(
+        self,
+        dim: int = VECTOR_DIM,
+        path: Path = INDEX_FILE,
+        kind: str = INDEX_TYPE,
+        metric: str = METRIC,
+    ):
+        self.dim = dim
+        self.path = path
+        # Sidecar with {sku_id: content hash} so a snapshot can be
+        # reconciled against the SKU table at startup
+        self.meta_path = path.with_suffix(".meta.json")
+        self.kind = kind
+        self.metric = metric
+        self._lock = threading.RLock()
+        self._index = self._empty()
+        self._hashes: Dict[int, str] = {}
+        self._dirty = False
+        self.loaded = False
+        # (mtime_ns, size) of the snapshot this index was loaded from or
+        # last wrote; a different stamp on disk means another process
+        # has written a newer one
+        self._stamp: Optional[Tuple[int, int]] = None
+
+    def _empty(self):
+        return make_index("flat", self.dim, metric=self.metric)
+
+    @property
+    def ntotal(self) -> int:
+        return int(self._index.ntotal)
+
+    @property
+    def active_kind(self) -> str:
+        return index_kind(self._index)
+
+    @property
+    def hashes(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._hashes)
+
+    def fingerprint(self) -> str:
+        """
+        Hash of what search results depend on: index type, metric and
+        every (sku_id, content hash) pair. Changes whenever a SKU is
+        added, removed or re-embedded.
+        """
+        with self._lock:
+            items = sorted(self._hashes.items())
+            kind = self.active_kind
+        h = hashlib.sha256(f"{kind}:{self.metric}:{self.dim}\n".encode())
+        for sku_id, content in items:
+            h.update(f"{sku_id}:{content}\n".encode())
+        return h.hexdigest()
+
+    # ---------------------------
+    # Snapshots
+    # ---------------------------
+    def _disk_stamp(self) -> Optional[Tuple[int, int]]:
+        # The sidecar is written last, so it marks a complete snapshot
+        try:
+            st = self.meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def snapshot_changed(self) -> bool:
+        """
+        True when the snapshot on disk is not the one this index last
+        loaded or wrote. One stat() call.
+        """
+        return self.loaded and self._disk_stamp() != self._stamp
+
+    def load(self) -> bool:
+        """
+        Load the last snapshot. Returns False (and keeps the current
+        index) when there is no usable snapshot.
+        """
+        with self._lock:
+            self.loaded = True
+            self._stamp = self._disk_stamp()
+            if not self.path.exists() or not self.meta_path.exists():
+                return False
+
+            try:
+                index = faiss.read_index(str(self.path))
+                meta = json.loads(self.meta_path.read_text())
+            except Exception as e:
+                log_event("index_snapshot_unreadable", path=str(self.path), error=f"{type(e).__name__}: {e}")
+                return False
+
+            # Old positional snapshots carry no SKU ids
+            id_mapped = isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+            if not id_mapped or index.d != self.dim:
+                return False
+            # Scores from another metric are not comparable: re-embed
+            if index_metric(index) != self.metric:
+                return False
+
+            self._index = index
+            self._hashes = {int(k): v for k, v in meta.items()}
+            self._dirty = False
+            return True
+
+    def snapshot(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            # Write then rename, so another process never loads a
+            # half-written file
+            tmp_index = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_meta = self.meta_path.with_name(f"{self.meta_path.name}.{os.getpid()}.tmp")
+            faiss.write_index(self._index, str(tmp_index))  # type: ignore
+            tmp_meta.write_text(json.dumps(self._hashes))
+            os.replace(tmp_index, self.path)
+            os.replace(tmp_meta, self.meta_path)
+            self._dirty = False
+            self._stamp = self._disk_stamp()
+        log_event("index_snapshot_written", path=str(self.path))
+
+    # ---------------------------
+    # Mutations
+    # ---------------------------
+    def reset(self) -> None:
+        with self._lock:
+            self._index = self._empty()
+            self._hashes = {}
+            self._dirty = True
+
+    def rebuild(
+        self,
+        ids: List[int],
+        vectors: List[List[float]],
+        hashes: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Replace the whole index, training the configured ANN type on the
+        given vectors when the catalog is large enough.
+        """
+        started = time.perf_counter()
+        xb = prepare_vectors(vectors, self.dim, self.metric)
+        xids = np.asarray(ids, dtype="int64")
+        kind = effective_kind(self.kind, len(ids))
+
+        index = make_index(kind, self.dim, xb, self.metric)
+        if len(ids):
+            index.add_with_ids(xb, xids)  # type: ignore[arg-type]
+
+        with self._lock:
+            self._index = index
+            self._hashes = {
+                int(sku_id): (hashes[i] if hashes else "")
+                for i, sku_id in enumerate(ids)
+            }
+            self._dirty = True
+        OPERATION_SECONDS.observe(time.perf_counter() - started, op="index_build")
+
+    def _remove_ids(self, ids: List[int]) -> None:
+        try:
+            self._index.remove_ids(np.asarray(ids, dtype="int64"))
+        except RuntimeError:
+            # HNSW cannot delete in place: rebuild from the kept vectors
+            drop = set(ids)
+            keep = [i for i in self._hashes if i not in drop]
+            vectors = [self._index.reconstruct(i) for i in keep]
+            hashes = [self._hashes[i] for i in keep]
+            self.rebuild(keep, vectors, hashes)
+
+    def upsert(
+        self,
+        ids: List[int],
+        vectors: List[List[float]],
+        hashes: Optional[List[str]] = None,
+    ) -> None:
+        if not ids:
+            return
+
+        xb = prepare_vectors(vectors, self.dim, self.metric)
+        xids = np.asarray(ids, dtype="int64")
+
+        with self._lock:
+            # FAISS has no in-place update: drop old vectors first
+            existing = [int(i) for i in ids if int(i) in self._hashes]
+            if existing:
+                self._remove_ids(existing)
+                for sku_id in existing:
+                    self._hashes.pop(sku_id, None)
+            self._index.add_with_ids(xb, xids)  # type: ignore[arg-type]
+            for i, sku_id in enumerate(ids):
+                self._hashes[int(sku_id)] = hashes[i] if hashes else ""
+            self._dirty = True
+
+    def remove(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            ids = [int(i) for i in ids if int(i) in self._hashes]
+            if not ids:
+                return
+
+            self._remove_ids(ids)
+            for sku_id in ids:
+                self._hashes.pop(sku_id, None)
+            self._dirty = True
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def search(self, query_vec: List[float], top_k: int = 3) -> Tuple[List[int], List[float]]:
+        return self.search_batch([query_vec], top_k)[0]
+
+    def search_batch(
+        self,
+        query_vecs: List[List[float]],
+        top_k: int = 3,
+        min_score: Optional[float] = None,
+    ) -> List[Tuple[List[int], List[float]]]:
+        """
+        One FAISS call for a whole (n, dim) query matrix.
+        Returns per-row (sku_ids, scores). In cosine mode, hits with a
+        similarity below min_score are dropped.
+        """
+        q = prepare_vectors(query_vecs, self.dim, self.metric)
+        if len(q) == 0:
+            return []
+
+        with self._lock:
+            if self._index.ntotal == 0:
+                return [([], []) for _ in range(len(q))]
+            with OPERATION_SECONDS.time(op="search"):
+                D, I = self._index.search(q, top_k)  # type: ignore[call-arg]
+
+        out = []
+        for ids, dists in zip(I, D):
+            # FAISS pads with -1 when fewer than top_k vectors exist
+            keep = ids != -1
+            if min_score is not None and self.metric == "cosine":
+                keep &= dists >= min_score
+            out.append((ids[keep].tolist(), dists[keep].tolist()))
+        return out
+
+
+# Process-wide index, see warm_index()
+sku_index = SKUIndex()
+# One warm_index() at a time (startup, pipeline workers, admin reload)
+_warm_lock = threading.Lock()
+
+
+def embed_skus(skus) -> Tuple[List[int], List[List[float]], List[str]]:
+    texts = [sku.description or "" for sku in skus]
+    ids = [int(sku.id) for sku in skus]
+    vectors = ai_agent.embed_batch(texts)
+    hashes = [content_hash(t) for t in texts]
+    return ids, vectors, hashes
+
+
+def upsert_skus(skus) -> None:
+    """
+    Add or refresh SKUs in the live index (call after commit).
+    """
+    ids, vectors, hashes = embed_skus(skus)
+    sku_index.upsert(ids, vectors, hashes)
+
+
+def remove_skus(sku_ids: Iterable[int]) -> None:
+    sku_index.remove(sku_ids)
+
+
+def warm_index() -> None:
+    """
+    Load the snapshot once and reconcile it with the SKU table, so only
+    SKUs added, changed or deleted since the snapshot are (re-)embedded.
+    The index is retrained from scratch when its type no longer matches
+    FAISS_INDEX_TYPE for the current catalog size.
+    """
+    sku_index.load()
+
+    with get_session() as session:
+        skus = session.exec(select(SKU)).all()
+
+    known = sku_index.hashes
+    current = {int(s.id): s for s in skus}
+
+    stale = [
+        s for sku_id, s in current.items()
+        if known.get(sku_id) != content_hash(s.description or "")
+    ]
+    removed = [sku_id for sku_id in known if sku_id not in current]
+
+    if effective_kind(sku_index.kind, len(current)) != sku_index.active_kind:
+        sku_index.rebuild(*embed_skus(skus))
+        stale, removed = list(skus), []
+    else:
+        remove_skus(removed)
+        upsert_skus(stale)
+    sku_index.snapshot()
+
+    log_event(
+        "index_ready", skus=sku_index.ntotal, index_type=sku_index.active_kind,
+        embedded=len(stale), removed=len(removed),
+    )
+
+
+def ensure_index() -> None:
+    """
+    Load the index on first use, and reload it when another process
+    (python -m app.seed_sku) has written a newer snapshot, so imported
+    SKUs are matched without restarting the API.
+    """
+    if sku_index.loaded and not sku_index.snapshot_changed():
         return
+    with _warm_lock:
+        if not sku_index.loaded or sku_index.snapshot_changed():
+            warm_index()
 
-    xb = np.array(vectors, dtype="float32")
 
-    index = faiss.IndexFlatL2(VECTOR_DIM)  # type: ignore
-    index.add(xb)                           # type: ignore[arg-type]
+def reload_index() -> Dict[str, object]:
+    """
+    Reload the snapshot and reconcile it with the SKU table now (admin
+    endpoint), e.g. after editing SKUs directly in the database.
+    """
+    with _warm_lock:
+        warm_index()
+    return {
+        "skus": sku_index.ntotal,
+        "index_type": sku_index.active_kind,
+        "fingerprint": sku_index.fingerprint(),
+    }
+
+
+def build_index(vectors: List[List[float]], ids: Optional[List[int]] = None) -> None:
+    """
+    Replace the live index with the given embedding vectors and snapshot it.
+    """
+    if not vectors:
+        log_event("index_not_built", reason="no vectors")
+        return
 
-    faiss.write_index(index, str(INDEX_FILE))  # type: ignore
-    print(f"FAISS index created at {INDEX_FILE}")
+    if ids is None:
+        ids = list(range(len(vectors)))
+
+    sku_index.rebuild(ids, vectors)
+    sku_index.loaded = True
+    sku_index.snapshot()
 
 
 def load_index():
@@ -34,9 +526,111 @@ def load_index():
 
 
 def search_index(query_vec: List[float], top_k: int = 3):
-    index = load_index()
+    """
+    Search the in-memory index. Returns (sku_ids, scores).
+    """
+    ensure_index()
+    return sku_index.search(query_vec, top_k)
+
+
+def search_index_batch(
+    query_vecs: List[List[float]],
+    top_k: int = 3,
+    min_score: Optional[float] = None,
+):
+    """
+    Search many queries at once. Returns a list of (sku_ids, scores),
+    one entry per query row.
+    """
+    ensure_index()
+    return sku_index.search_batch(query_vecs, top_k, min_score)
+
+
+# ---------------------------
+# Recall vs latency report
+# ---------------------------
+def recall_report(
+    xb: np.ndarray,
+    xq: np.ndarray,
+    top_k: int = 10,
+    kinds: Iterable[str] = INDEX_KINDS,
+    nprobes: Iterable[int] = (1, 4, 16, 64),
+    ef_searches: Iterable[int] = (16, 32, 64, 128),
+    metric: str = METRIC,
+) -> List[Dict]:
+    """
+    Build each index kind over xb and compare its top_k results for xq
+    against exact flat search. One row per (kind, search knob) with
+    recall@k, per-query latency, build time and serialized size.
+    """
+    dim = xb.shape[1]
+    xb = prepare_vectors(xb, dim, metric)
+    xq = prepare_vectors(xq, dim, metric)
+    ids = np.arange(len(xb), dtype="int64")
+
+    exact = make_index("flat", dim, metric=metric)
+    exact.add_with_ids(xb, ids)  # type: ignore[arg-type]
+    _, truth = exact.search(xq, top_k)  # type: ignore[call-arg]
+
+    rows = []
+    for kind in kinds:
+        t0 = time.perf_counter()
+        index = make_index(kind, dim, xb, metric)
+        index.add_with_ids(xb, ids)  # type: ignore[arg-type]
+        build_s = time.perf_counter() - t0
+        size = int(faiss.serialize_index(index).nbytes)
+
+        if kind in ("ivf", "ivfpq"):
+            knobs = [{"nprobe": n} for n in nprobes]
+        elif kind == "hnsw":
+            knobs = [{"ef_search": ef} for ef in ef_searches]
+        else:
+            knobs = [{}]
+
+        for knob in knobs:
+            set_search_params(index, **knob)
+
+            t0 = time.perf_counter()
+            _, found = index.search(xq, top_k)  # type: ignore[call-arg]
+            elapsed = time.perf_counter() - t0
+
+            hits = sum(
+                len(set(f[f != -1].tolist()) & set(t.tolist()))
+                for f, t in zip(found, truth)
+            )
+
+            rows.append({
+                "kind": kind,
+                "metric": metric,
+                **knob,
+                "recall_at_k": hits / float(len(xq) * top_k),
+                "ms_per_query": 1000.0 * elapsed / len(xq),
+                "build_s": build_s,
+                "index_bytes": size,
+            })
+
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FAISS recall vs latency report")
+    parser.add_argument("--n", type=int, default=100_000, help="synthetic catalog size")
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--catalog", action="store_true", help="use the SKU table instead of synthetic vectors")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.catalog:
+        with get_session() as session:
+            _, vectors, _ = embed_skus(session.exec(select(SKU)).all())
+        xb = np.asarray(vectors, dtype="float32").reshape(-1, VECTOR_DIM)
+    else:
+        xb = rng.random((args.n, VECTOR_DIM), dtype="float32")
 
-    q = np.array([query_vec], dtype="float32")
-    D, I = index.search(q, top_k)
+    picks = rng.integers(0, len(xb), size=args.queries)
+    noise = rng.normal(0, 0.01, (args.queries, xb.shape[1])).astype("float32")
 
-    return I[0].tolist(), D[0].tolist()
+    print(json.dumps(recall_report(xb, xb[picks] + noise, top_k=args.top_k), indent=2))
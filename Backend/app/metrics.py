@@ -0,0 +1,321 @@
+# backend/app/metrics.py
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# In-process metrics in the Prometheus text format (served on /metrics)
+# plus one-line JSON logs. Hand-rolled to avoid a client dependency;
+# counts are per process, so run one scrape target per worker.
+STRUCTURED_LOGS = os.environ.get("STRUCTURED_LOGS", "1") == "1"
+# Requests slower than this are logged; 0 logs every request
+LOG_SLOW_REQUEST_MS = float(os.environ.get("LOG_SLOW_REQUEST_MS", "1000"))
+
+# Seconds; covers sub-ms lookups up to multi-minute LLM extractions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+# ---------------------------
+# Structured logs
+# ---------------------------
+def log_event(event_name: str, **fields) -> None:
+    """
+    One JSON object per line on stderr, e.g.
+    {"ts": "...", "event": "pipeline_stage", "stage": "extract", ...}
+    With STRUCTURED_LOGS=0, a plain "event key=value" line instead.
+    stderr, like uvicorn's own logs, so stdout stays free for CLI
+    output (the benchmark report, seed_sku results).
+    """
+    if not STRUCTURED_LOGS:
+        print(event_name, " ".join(f"{k}={v}" for k, v in fields.items()), file=sys.stderr, flush=True)
+        return
+    record = {"ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z", "event": event_name}
+    record.update(fields)
+    print(json.dumps(record, default=str), file=sys.stderr, flush=True)
+
+
+# ---------------------------
+# Metric types
+# ---------------------------
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = _labels(self.label_names, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative:g}")
+            cumulative += row[len(self.buckets)]
+            le = _labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {row[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative:g}")
+        return lines
+
+
+_registry: List = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Metrics
+# ---------------------------
+PIPELINE_STAGE_SECONDS = _register(Histogram(
+    "optibids_pipeline_stage_seconds",
+    "run_pipeline stage duration; outcome is run or skipped (checkpoint hit)",
+    ["stage", "outcome"],
+))
+OPERATION_SECONDS = _register(Histogram(
+    "optibids_operation_seconds",
+    "Duration of hot operations (embed, index_build, search, pricing, docx)",
+    ["op"],
+))
+
+LLM_REQUEST_SECONDS = _register(Histogram(
+    "optibids_llm_request_seconds",
+    "Ollama generate latency, queueing for a concurrency slot included",
+    ["mode", "outcome"],
+))
+LLM_QUEUE_SECONDS = _register(Histogram(
+    "optibids_llm_queue_seconds",
+    "Time waiting for an LLM concurrency slot",
+))
+LLM_TOKENS = _register(Histogram(
+    "optibids_llm_tokens",
+    "Tokens per LLM call (prompt_eval_count / eval_count)",
+    ["kind"],
+    TOKEN_BUCKETS,
+))
+LLM_TOKENS_TOTAL = _register(Counter(
+    "optibids_llm_tokens_total",
+    "Tokens processed by the LLM",
+    ["kind"],
+))
+LLM_TIMEOUTS = _register(Counter(
+    "optibids_llm_timeouts_total",
+    "LLM calls that timed out",
+    ["mode"],
+))
+
+HTTP_REQUEST_SECONDS = _register(Histogram(
+    "optibids_http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+))
+HTTP_DB_QUERIES = _register(Histogram(
+    "optibids_http_db_queries",
+    "DB statements executed per HTTP request",
+    ["method", "route"],
+    COUNT_BUCKETS,
+))
+DB_QUERIES = _register(Counter(
+    "optibids_db_queries_total",
+    "DB statements executed",
+))
+DB_QUERY_SECONDS = _register(Histogram(
+    "optibids_db_query_seconds",
+    "DB statement execution time",
+))
+
+
+# ---------------------------
+# Hooks
+# ---------------------------
+def observe_stage(tender_id: int, stage: str, seconds: float, skipped: bool) -> None:
+    """
+    pipeline.stage_listeners callback.
+    """
+    outcome = "skipped" if skipped else "run"
+    PIPELINE_STAGE_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+    log_event(
+        "pipeline_stage", tender_id=tender_id, stage=stage,
+        outcome=outcome, ms=round(seconds * 1000, 2),
+    )
+
+
+def observe_llm(mode: str, outcome: str, seconds: float, queued: float, data: Optional[dict] = None) -> None:
+    """
+    One Ollama call; data is the final response object, whose
+    prompt_eval_count / eval_count carry the token counts.
+    """
+    LLM_REQUEST_SECONDS.observe(seconds, mode=mode, outcome=outcome)
+    LLM_QUEUE_SECONDS.observe(queued)
+    if outcome == "timeout":
+        LLM_TIMEOUTS.inc(mode=mode)
+
+    fields = {"mode": mode, "outcome": outcome, "ms": round(seconds * 1000, 2), "queued_ms": round(queued * 1000, 2)}
+    for kind, key in (("prompt", "prompt_eval_count"), ("response", "eval_count")):
+        count = (data or {}).get(key)
+        if isinstance(count, (int, float)):
+            LLM_TOKENS.observe(count, kind=kind)
+            LLM_TOKENS_TOTAL.inc(count, kind=kind)
+            fields[f"{kind}_tokens"] = count
+    log_event("llm_call", **fields)
+
+
+# Statement count of the HTTP request being served (see MetricsMiddleware)
+_request_queries: contextvars.ContextVar = contextvars.ContextVar("request_queries", default=None)
+
+
+def instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERIES.inc()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started)
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def _route_template(scope) -> str:
+    """
+    Full path template of the matched route, router prefix included.
+    Newer FastAPI matches included routers in place, so scope["route"]
+    holds the router's own path ("/tenders" for both /tenders and
+    /admin/tenders); the effective route context has the prefixed one.
+    Older versions copy routes with the prefix into path_format.
+    """
+    ctx = (scope.get("fastapi") or {}).get("effective_route_context")
+    template = getattr(ctx, "path_format", None) or getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return "unmatched"
+    # Mounted sub-apps: root_path carries the mount prefix
+    return scope.get("root_path", "").rstrip("/") + template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: latency and DB statement count per route template
+    (/admin/tenders/{tender_id}, not the raw path, to bound the label
+    set). Times the full response, streaming bodies included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        queries = [0]
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - started
+            _request_queries.reset(token)
+
+            path = _route_template(scope)
+            method = scope.get("method", "")
+            HTTP_REQUEST_SECONDS.observe(seconds, method=method, route=path, status=status["code"])
+            HTTP_DB_QUERIES.observe(queries[0], method=method, route=path)
+
+            if seconds * 1000 >= LOG_SLOW_REQUEST_MS:
+                log_event(
+                    "http_request", method=method, route=path, status=status["code"],
+                    ms=round(seconds * 1000, 2), db_queries=queries[0],
+                )
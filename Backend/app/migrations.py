@@ -0,0 +1,142 @@
+# backend/app/migrations.py
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import text
+
+from .metrics import log_event
+
+# create_all() only creates missing tables, and db.add_missing_columns()
+# only adds nullable columns. Anything else an existing database needs
+# (indexes, constraints, data fixes) goes here as a numbered migration.
+# Each migration runs once, in its own transaction, and is recorded in
+# the schema_migrations table. Never renumber or edit an applied one:
+# append a new version instead.
+
+
+class MigrationError(Exception):
+    pass
+
+
+# ---------------------------
+# Migrations
+# ---------------------------
+def _v1_lookup_indexes(conn) -> None:
+    """
+    Indexes for the per-tender and per-applicant lookups. Names match
+    what create_all() generates from models.py, so fresh databases are
+    a no-op.
+    """
+    dupes = conn.execute(text(
+        "SELECT tender_id, user_id, COUNT(*) FROM application "
+        "GROUP BY tender_id, user_id HAVING COUNT(*) > 1"
+    )).all()
+    if dupes:
+        pairs = ", ".join(f"(tender {t}, user {u}) x{n}" for t, u, n in dupes[:10])
+        raise MigrationError(
+            f"duplicate applications block the unique index: {pairs}. "
+            "Remove the extra rows and restart."
+        )
+
+    for stmt in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_application_tender_user "
+        "ON application (tender_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_application_user_status "
+        "ON application (user_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_tender_status ON tender (status)",
+        "CREATE INDEX IF NOT EXISTS ix_requirement_tender_id ON requirement (tender_id)",
+        "CREATE INDEX IF NOT EXISTS ix_match_tender_id ON match (tender_id)",
+        "CREATE INDEX IF NOT EXISTS ix_pricing_tender_id ON pricing (tender_id)",
+        "CREATE INDEX IF NOT EXISTS ix_sku_sku_code ON sku (sku_code)",
+    ):
+        conn.execute(text(stmt))
+
+
+def _v2_unique_sku_code(conn) -> None:
+    """
+    Make sku.sku_code unique. Earlier startups re-seeded the same SKUs
+    every time: copies identical to the first row of their code are
+    folded into it (matches repointed, then deleted). Codes whose rows
+    actually differ are left for a human to resolve.
+    """
+    conflicts = conn.execute(text(
+        "SELECT sku_code, COUNT(*) FROM ("
+        "SELECT DISTINCT sku_code, description, specs_json, price_base FROM sku"
+        ") AS v GROUP BY sku_code HAVING COUNT(*) > 1"
+    )).all()
+    if conflicts:
+        codes = ", ".join(f"{c} x{n}" for c, n in conflicts[:10])
+        raise MigrationError(
+            f"SKUs sharing a code with different data block the unique index: {codes}. "
+            "Remove or rename the extra rows and restart."
+        )
+
+    conn.execute(text(
+        "UPDATE match SET sku_id = ("
+        "SELECT MIN(k.id) FROM sku AS k JOIN sku AS d ON d.sku_code = k.sku_code "
+        "WHERE d.id = match.sku_id) "
+        "WHERE sku_id IN (SELECT s.id FROM sku AS s WHERE s.id <> ("
+        "SELECT MIN(k.id) FROM sku AS k WHERE k.sku_code = s.sku_code))"
+    ))
+    removed = conn.execute(text(
+        "DELETE FROM sku WHERE id <> ("
+        "SELECT MIN(k.id) FROM sku AS k WHERE k.sku_code = sku.sku_code)"
+    )).rowcount
+    if removed:
+        log_event("duplicate_skus_removed", removed=removed)
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_sku_sku_code"))
+    conn.execute(text("CREATE UNIQUE INDEX ix_sku_sku_code ON sku (sku_code)"))
+
+
+# (version, name, fn(connection)) in apply order
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "lookup indexes", _v1_lookup_indexes),
+    (2, "unique sku code", _v2_unique_sku_code),
+]
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at VARCHAR NOT NULL)"
+        ))
+        return {v for (v,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations(engine) -> List[int]:
+    """
+    Apply pending migrations in version order. Stops at the first
+    failure (later migrations may depend on it) and leaves it pending
+    so the next startup retries. Returns the versions applied now.
+    """
+    done = applied_versions(engine)
+    applied = []
+
+    for version, name, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(
+                    text(
+                        "INSERT INTO schema_migrations (version, name, applied_at) "
+                        "VALUES (:v, :n, :t)"
+                    ),
+                    {"v": version, "n": name, "t": datetime.utcnow().isoformat()},
+                )
+        except Exception as e:
+            log_event("migration_failed", version=version, name=name, error=f"{type(e).__name__}: {e}")
+            break
+
+        log_event("migration_applied", version=version, name=name)
+        applied.append(version)
+
+    return applied
@@ -1,5 +1,6 @@
 # backend/app/models.py
 from sqlmodel import SQLModel, Field, Text
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime
 from sqlmodel import  Field, Relationship
@@ -27,7 +28,13 @@ class Tender(SQLModel, table=True):
     description: str
     raw_text: str
     summary_json: Optional[str] = None
-    status: str = "draft"
+    # Hash of the inputs summary_json was built from, see
+    # ai_agent.summary_cache_key; None means no valid cached summary
+    summary_key: Optional[str] = None
+    status: str = Field(default="draft", index=True)
+    # Progress of run_pipeline (extracting, matching, ..., completed,
+    # failed); kept apart from the publication status above
+    pipeline_status: Optional[str] = None
     files: Optional[str] = None
 
     applications: List["Application"] = Relationship()
@@ -38,6 +45,14 @@ from typing import Optional
 from sqlmodel import SQLModel, Field, Relationship
 
 class Application(SQLModel, table=True):
+    __table_args__ = (
+        # One application per applicant per tender; also serves
+        # "applications for tender X"
+        Index("ux_application_tender_user", "tender_id", "user_id", unique=True),
+        # Applicant views: my offered / accepted applications
+        Index("ix_application_user_status", "user_id", "status"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     tender_id: int = Field(foreign_key="tender.id")
@@ -48,6 +63,11 @@ class Application(SQLModel, table=True):
     status: str = Field(default="submitted", index=True)
     offer_json: Optional[str] = None
 
+    # Per-application AI digest for map-reduce summaries, valid while
+    # digest_key matches ai_agent.digest_cache_key
+    digest_json: Optional[str] = None
+    digest_key: Optional[str] = None
+
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     user: Optional["User"] = Relationship(back_populates="applications")
@@ -57,27 +77,98 @@ class Application(SQLModel, table=True):
 
 class Requirement(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    tender_id: int
+    tender_id: int = Field(index=True)
     req_json: str
     confidence: float
 
 class SKU(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    sku_code: str
+    # Unique: the catalog importer upserts on it (see seed_sku)
+    sku_code: str = Field(index=True, unique=True)
     description: str
     specs_json: Optional[str] = None
     price_base: float = 0.0
+    # Picks the PricingRule tiers that apply
+    category: Optional[str] = None
 
 class Match(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    tender_id: int
+    tender_id: int = Field(index=True)
     sku_id: int
     score: float
+    # "cosine" (similarity, higher is better) or "l2" (distance, lower is
+    # better). Rows written before this column existed are L2.
+    metric: Optional[str] = None
     explanation: Optional[str] = None
 
 class Pricing(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    tender_id: int
+    tender_id: int = Field(index=True)
     line_items: str
     total_amount: float
     margin_percent: float = 10.0
+
+
+class PricingRule(SQLModel, table=True):
+    """
+    One quantity tier: lines of `category` (NULL = any category without
+    rules of its own) ordering at least min_qty get discount_percent
+    off the base price and margin_percent on top (see pricing.PriceBook).
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    category: Optional[str] = Field(default=None, index=True)
+    min_qty: float = 0.0
+    discount_percent: float = 0.0
+    margin_percent: float = 10.0
+
+
+class EmbeddingCache(SQLModel, table=True):
+    # sha256 of (backend, model, dim, text), see embeddings.cache_key
+    key: str = Field(primary_key=True)
+    model: str
+    dim: int
+    vector: bytes  # float32 little-endian
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class PipelineStage(SQLModel, table=True):
+    """
+    Checkpoint of one completed run_pipeline stage for a tender: the
+    hash of its inputs and what it produced. A stage whose inputs hash
+    the same on the next run is skipped.
+    """
+    __table_args__ = (
+        Index("ux_pipelinestage_tender_stage", "tender_id", "stage", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tender_id: int
+    stage: str  # parse | extract | match | price | proposal
+    input_hash: str
+    output_json: str
+    completed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ExtractionCache(SQLModel, table=True):
+    # sha256 of (model, prompt version, window text), see
+    # ai_agent.extraction_cache_key
+    key: str = Field(primary_key=True)
+    result_json: str  # {"requirements": [...], "confidence": float}
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class Job(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(default="pipeline")
+    tender_id: int = Field(index=True)
+
+    # queued -> running -> done | failed (back to queued while retrying)
+    status: str = Field(default="queued", index=True)
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
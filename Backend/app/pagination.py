@@ -0,0 +1,94 @@
+# backend/app/pagination.py
+import os
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import HTTPException, Query, Response
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "200"))
+
+# The response body stays a plain list; the cursor for the next page
+# (if there is one) travels in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page:
+    """
+    Keyset pagination + field projection query params, shared by the
+    list endpoints.
+
+    ?limit=50&cursor=<last id seen>&order=asc|desc&fields=id,title
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[int] = Query(None, description="Last id of the previous page"),
+        order: str = Query("asc", pattern="^(asc|desc)$"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.order = order
+        self.fields = fields
+
+    def columns(self, available: Dict[str, Any]) -> List[str]:
+        """
+        Names of the requested fields (all of them by default), in
+        request order. Unknown names are a 400.
+        """
+        if not self.fields:
+            return list(available)
+
+        names = []
+        for name in self.fields.split(","):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+
+        unknown = [n for n in names if n not in available]
+        if unknown or not names:
+            raise HTTPException(
+                400,
+                f"Unknown fields: {', '.join(unknown)}. "
+                f"Available: {', '.join(available)}",
+            )
+        return names
+
+    def apply(self, stmt, key):
+        """
+        Seek past the cursor on the key column (an indexed id), in key
+        order, fetching one extra row to know whether a next page exists.
+        """
+        if self.order == "desc":
+            if self.cursor is not None:
+                stmt = stmt.where(key < self.cursor)
+            stmt = stmt.order_by(key.desc())
+        else:
+            if self.cursor is not None:
+                stmt = stmt.where(key > self.cursor)
+            stmt = stmt.order_by(key)
+        return stmt.limit(self.limit + 1)
+
+    def finish(self, rows: list, response: Response) -> list:
+        """
+        Trim the look-ahead row and publish the next cursor. Rows must
+        have the key as their first column.
+        """
+        rows = list(rows)
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            response.headers[NEXT_CURSOR_HEADER] = str(rows[-1][0])
+        return rows
+
+
+def project(names: List[str], values, decoders: Optional[Dict[str, Callable]] = None) -> dict:
+    """
+    Build a response dict from selected values, running per-field
+    decoders (JSON columns, defaults) where given.
+    """
+    decoders = decoders or {}
+    out = {}
+    for name, value in zip(names, values):
+        decode = decoders.get(name)
+        out[name] = decode(value) if decode else value
+    return out
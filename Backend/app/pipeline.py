@@ -1,115 +1,366 @@
 # pipeline.py
-from typing import List
+import os
 import json
+import time
+import hashlib
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import delete
 from sqlmodel import select
 
 from .db import get_session
-from .models import Tender, Requirement, SKU, Match, Pricing
-from . import ai_agent, matcher, pricing as pricing_mod, consolidator
+from .models import Tender, Requirement, SKU, Match, Pricing, ExtractionCache, PipelineStage
+from . import ai_agent, embeddings, matcher, pricing as pricing_mod, consolidator, extraction
+from .metrics import log_event, observe_stage
 
+# SQLite IN (...) lists are capped, so cache lookups go in slices
+_CACHE_LOOKUP_CHUNK = 500
+
+
+def load_extraction_cache(keys: List[str]) -> Dict[str, dict]:
+    found: Dict[str, dict] = {}
+    with get_session() as session:
+        for i in range(0, len(keys), _CACHE_LOOKUP_CHUNK):
+            rows = session.exec(
+                select(ExtractionCache)
+                .where(ExtractionCache.key.in_(keys[i:i + _CACHE_LOOKUP_CHUNK]))
+            ).all()
+            for row in rows:
+                found[row.key] = json.loads(row.result_json)
+    return found
+
+
+def save_extraction_cache(results: Dict[str, dict]) -> None:
+    if not results:
+        return
+    with get_session() as session:
+        for key, result in results.items():
+            session.merge(ExtractionCache(key=key, result_json=json.dumps(result)))
+        session.commit()
+
+
+# ---------------------------
+# Stage checkpoints
+# ---------------------------
+def input_hash(*parts) -> str:
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def load_checkpoint(tender_id: int, stage: str, in_hash: str) -> Optional[dict]:
+    """
+    Output of the stage's last completed run if it had the same inputs.
+    """
+    with get_session() as session:
+        row = session.exec(
+            select(PipelineStage)
+            .where(PipelineStage.tender_id == tender_id)
+            .where(PipelineStage.stage == stage)
+        ).first()
+        if row is None or row.input_hash != in_hash:
+            return None
+        return json.loads(row.output_json)
+
+
+def commit_stage(
+    tender_id: int,
+    stage: str,
+    in_hash: str,
+    output: dict,
+    model=None,
+    rows: Optional[list] = None,
+    next_status: Optional[str] = None,
+) -> None:
+    """
+    In one transaction: replace the tender's rows of `model` with
+    `rows`, record the checkpoint and advance pipeline_status. A crash
+    before the commit leaves the previous run's rows and checkpoint.
+    """
+    with get_session() as session:
+        if model is not None:
+            session.execute(delete(model).where(model.tender_id == tender_id))
+            for row in rows or []:
+                session.add(row)
+
+        cp = session.exec(
+            select(PipelineStage)
+            .where(PipelineStage.tender_id == tender_id)
+            .where(PipelineStage.stage == stage)
+        ).first()
+        if cp is None:
+            cp = PipelineStage(tender_id=tender_id, stage=stage, input_hash="", output_json="")
+            session.add(cp)
+        cp.input_hash = in_hash
+        cp.output_json = json.dumps(output)
+        cp.completed_at = datetime.utcnow()
+
+        if next_status:
+            tender = session.get(Tender, tender_id)
+            tender.pipeline_status = next_status
+
+        session.commit()
+
+
+def set_pipeline_status(tender_id: int, status: str) -> None:
+    with get_session() as session:
+        tender = session.get(Tender, tender_id)
+        tender.pipeline_status = status
+        session.commit()
+
+
+# ---------------------------
+# Stage timings
+# ---------------------------
+# Each is called as fn(tender_id, stage, seconds, skipped) when a stage
+# finishes; skipped means its checkpoint was reused
+stage_listeners: List[Callable] = [observe_stage]
+
+
+def _stage_done(tender_id: int, stage: str, started: float, skipped: bool) -> None:
+    seconds = time.perf_counter() - started
+    for fn in stage_listeners:
+        try:
+            fn(tender_id, stage, seconds, skipped)
+        except Exception as e:
+            log_event("stage_listener_failed", stage=stage, error=str(e))
+
+
+# ---------------------------
+# Pipeline
+# ---------------------------
 def run_pipeline(tender_id: int) -> None:
+    """
+    parse -> extract -> match -> price -> proposal.
+
+    Every stage hashes its inputs and is skipped when they match its
+    last checkpoint, so a retry after a crash resumes at the first
+    stage that did not finish, and an unchanged tender costs no model
+    calls. A stage that does run replaces the tender's previous
+    Requirement / Match / Pricing rows instead of appending. A stage
+    whose LLM calls or attachment parsing fail raises without writing
+    its checkpoint, so the job queue retries it with backoff.
+    """
     # ------------------ LOAD TENDER ------------------
     with get_session() as session:
         tender = session.get(Tender, tender_id)
         if tender is None:
-            print("Tender not found:", tender_id)
+            log_event("tender_not_found", tender_id=tender_id)
             return
 
-        tender.status = "extracting"
+        # Read before commit: the instance is expired and detached after it
+        source_text = tender.raw_text or tender.description
+        description = tender.description
+        files = json.loads(tender.files) if tender.files else []
+        tender.pipeline_status = "parsing" if files else "extracting"
         session.commit()
 
+    # ------------------ STEP 0: Attached Documents ------------------
+    # raw_text = form description + text of the uploaded documents
+    if files:
+        started = time.perf_counter()
+        h = input_hash(description, files, extraction.EXTRACTOR_VERSION)
+        done = load_checkpoint(tender_id, "parse", h)
+
+        if done is None:
+            # Raises ExtractionError (-> job retry) before any checkpoint
+            doc_text = extraction.extract_documents(files)
+            source_text = f"{description}\n\n{doc_text}" if doc_text else description
+
+            with get_session() as session:
+                tender = session.get(Tender, tender_id)
+                tender.raw_text = source_text
+                session.commit()
+
+            commit_stage(tender_id, "parse", h, {"chars": len(source_text)})
+
+        set_pipeline_status(tender_id, "extracting")
+        _stage_done(tender_id, "parse", started, skipped=done is not None)
+
     # ------------------ STEP 1: Extract Requirements ------------------
-    extracted = ai_agent.extract_requirements_from_text(
-        tender.raw_text or tender.description
+    started = time.perf_counter()
+    windows = ai_agent.requirement_windows(source_text)
+    h = input_hash(
+        "extract",
+        [ai_agent.extraction_cache_key(w) for w in windows],
+        ai_agent.EXTRACT_DEDUP_SIMILARITY,
     )
+    extracted = load_checkpoint(tender_id, "extract", h)
+    skipped = extracted is not None
 
-    requirements = extracted.get("requirements", [])
-    confidence = float(extracted.get("confidence", 0.9))
+    if not skipped:
+        # Long texts are split into windows; unchanged windows come from cache
+        cached = load_extraction_cache([ai_agent.extraction_cache_key(w) for w in windows])
+        try:
+            extracted, fresh = ai_agent.extract_requirements(windows, cached)
+        except ai_agent.ExtractionIncomplete as e:
+            # Keep what did succeed, so the job retry only redoes the rest.
+            # No checkpoint: the retry must run this stage again.
+            save_extraction_cache(e.fresh)
+            raise
+        save_extraction_cache(fresh)
 
-    with get_session() as session:
-        session.add(
-            Requirement(
-                tender_id=tender_id,
-                req_json=json.dumps(requirements),
-                confidence=confidence,
-            )
+        commit_stage(
+            tender_id, "extract", h, extracted,
+            model=Requirement,
+            rows=[
+                Requirement(
+                    tender_id=tender_id,
+                    req_json=json.dumps(extracted.get("requirements", [])),
+                    confidence=float(extracted.get("confidence", 0.9)),
+                )
+            ],
+            next_status="matching",
         )
-        session.commit()
+    else:
+        set_pipeline_status(tender_id, "matching")
 
-    # ------------------ STEP 2: Build SKU Index ------------------
-    with get_session() as session:
-        skus = session.exec(select(SKU)).all()
-
-    vectors: List[List[float]] = [
-        ai_agent.embed_text(sku.description or "") for sku in skus
-    ]
+    requirements = extracted.get("requirements", [])
+    _stage_done(tender_id, "extract", started, skipped)
 
+    # ------------------ STEP 2: SKU Index ------------------
+    # The index is long-lived (see matcher.warm_index); only load it here
+    # if startup did not.
+    started = time.perf_counter()
     try:
-        matcher.build_index(vectors)
+        matcher.ensure_index()
     except Exception as e:
-        print("FAISS error:", e)
+        log_event("index_failed", tender_id=tender_id, error=str(e))
+    _stage_done(tender_id, "index", started, skipped=False)
 
     # ------------------ STEP 3: Matching ------------------
-    matches_for_pricing = []
+    started = time.perf_counter()
+    h = input_hash(
+        "match",
+        requirements,
+        matcher.sku_index.fingerprint(),
+        matcher.MIN_SIMILARITY,
+        embeddings.EMBED_BACKEND,
+        embeddings.EMBED_MODEL,
+    )
+    matched = load_checkpoint(tender_id, "match", h)
+    skipped = matched is not None
 
-    with get_session() as session:
-        tender = session.get(Tender, tender_id)
-        tender.status = "matching"
-        session.commit()
+    if not skipped:
+        # Embed every requirement, then search them in a single FAISS call
+        query_vecs = ai_agent.embed_batch(
+            [str(r.get("text", "")) for r in requirements]
+        )
+        # Low-similarity hits are dropped here so they are never priced
+        results = matcher.search_index_batch(
+            query_vecs, top_k=3, min_score=matcher.MIN_SIMILARITY
+        )
 
-        for r in requirements:
-            qv = ai_agent.embed_text(str(r.get("text", "")))
-            ids, scores = matcher.search_index(qv, top_k=3)
-
-            for idx, score in zip(ids, scores):
-                if idx < len(skus):
-                    sku = skus[idx]
-
-                    session.add(
-                        Match(
-                            tender_id=tender_id,
-                            sku_id=sku.id,
-                            score=float(score),
-                            explanation="auto",
-                        )
-                    )
-
-                    matches_for_pricing.append({
-                        "sku_code": sku.sku_code,
-                        "price_base": sku.price_base,
-                        "quantity": r.get("quantity", 1),
-                    })
+        hit_ids = {int(i) for ids, _ in results for i in ids}
+        with get_session() as session:
+            known = set(session.exec(select(SKU.id).where(SKU.id.in_(hit_ids))).all()) if hit_ids else set()
 
-        session.commit()
+        # Hits stay best-first per requirement ("req"), for best-match pricing
+        matches = [
+            {"req": n, "sku_id": int(sku_id), "score": float(score), "quantity": r.get("quantity", 1)}
+            for n, (r, (ids, scores)) in enumerate(zip(requirements, results))
+            for sku_id, score in zip(ids, scores)
+            if int(sku_id) in known
+        ]
+        matched = {"matches": matches}
 
-    # ------------------ STEP 4: Pricing ------------------
-    pricing_out = pricing_mod.compute_pricing(matches_for_pricing)
+        commit_stage(
+            tender_id, "match", h, matched,
+            model=Match,
+            rows=[
+                Match(
+                    tender_id=tender_id,
+                    sku_id=m["sku_id"],
+                    score=m["score"],
+                    metric=matcher.sku_index.metric,
+                    explanation="auto",
+                )
+                for m in matches
+            ],
+            next_status="pricing",
+        )
+    else:
+        set_pipeline_status(tender_id, "pricing")
+    _stage_done(tender_id, "match", started, skipped)
 
+    # ------------------ STEP 4: Pricing ------------------
+    # Current SKU codes/prices/categories and pricing rules, so a change
+    # to any of them re-prices the tender
+    started = time.perf_counter()
+    sku_ids = {m["sku_id"] for m in matched["matches"]}
     with get_session() as session:
-        tender = session.get(Tender, tender_id)
-        tender.status = "pricing"
-
-        session.add(
-            Pricing(
-                tender_id=tender_id,
-                line_items=json.dumps(pricing_out["line_items"]),
-                total_amount=float(pricing_out["total"]),
-                margin_percent=10.0,
-            )
-        )
-        session.commit()
+        sku_by_id = {
+            sku.id: sku
+            for sku in (session.exec(select(SKU).where(SKU.id.in_(sku_ids))).all() if sku_ids else [])
+        }
 
-    # ------------------ STEP 5: Proposal ------------------
-    consolidator.make_proposal(
-        requirements,
-        pricing_out,
+    matches_for_pricing = [
         {
-            "name": "System",
-            "source": "auto_pipeline"
+            "sku_code": sku_by_id[m["sku_id"]].sku_code,
+            "price_base": sku_by_id[m["sku_id"]].price_base,
+            "category": sku_by_id[m["sku_id"]].category,
+            "quantity": m["quantity"],
+            "req": m["req"],
         }
-    )
+        for m in matched["matches"]
+        if m["sku_id"] in sku_by_id
+    ]
+    book = pricing_mod.load_price_book()
 
-    with get_session() as session:
-        tender = session.get(Tender, tender_id)
-        tender.status = "completed"
-        session.commit()
+    h = input_hash("price", matches_for_pricing, book.fingerprint(), pricing_mod.PRICING_SELECTION)
+    pricing_out = load_checkpoint(tender_id, "price", h)
+    skipped = pricing_out is not None
+
+    if not skipped:
+        pricing_out = pricing_mod.price_lines(pricing_mod.LineItems(matches_for_pricing), book)
+
+        commit_stage(
+            tender_id, "price", h, pricing_out,
+            model=Pricing,
+            rows=[
+                Pricing(
+                    tender_id=tender_id,
+                    line_items=json.dumps(pricing_out["line_items"]),
+                    total_amount=float(pricing_out["total"]),
+                    margin_percent=pricing_mod.margin_percent(pricing_out),
+                )
+            ],
+        )
+
+    _stage_done(tender_id, "price", started, skipped)
+
+    # ------------------ STEP 5: Proposal ------------------
+    # Rendered in consolidator's worker pool, off the critical path: the
+    # tender is complete once priced, and the checkpoint is recorded
+    # when the document lands.
+    started = time.perf_counter()
+    h = input_hash("proposal", requirements, pricing_out)
+    proposal = load_checkpoint(tender_id, "proposal", h)
+
+    if proposal is None or not os.path.exists(proposal.get("path", "")):
+        rendering = consolidator.submit_proposal(
+            requirements,
+            {
+                "name": "System",
+                "source": "auto_pipeline"
+            },
+            pricing_out,
+        )
+        rendering.add_done_callback(
+            lambda fut: _proposal_rendered(tender_id, h, started, fut)
+        )
+    else:
+        _stage_done(tender_id, "proposal", started, skipped=True)
+
+    set_pipeline_status(tender_id, "completed")
+
+
+def _proposal_rendered(tender_id: int, in_hash: str, started: float, fut) -> None:
+    if fut.cancelled():
+        return
+    if fut.exception() is not None:
+        log_event("proposal_render_failed", tender_id=tender_id, error=str(fut.exception()))
+        return
+    commit_stage(tender_id, "proposal", in_hash, {"path": fut.result()})
+    # Time from submit to file on disk, queueing in the pool included
+    _stage_done(tender_id, "proposal", started, skipped=False)
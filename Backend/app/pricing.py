@@ -1,14 +1,193 @@
 # backend/app/pricing.py
-def compute_pricing(matches):
-    # simple pricing: base_price * 1.2 margin
-    line_items = []
-    total = 0.0
-    for m in matches:
-        base = m.get("price_base", 100.0)
-        qty = m.get("quantity", 1)
-        amount = base * qty
-        line_items.append({"sku": m.get("sku_code"), "qty": qty, "amount": amount})
-        total += amount
-    margin = total * 0.10
-    total_with_margin = total + margin
-    return {"line_items": line_items, "total": total_with_margin, "margin": margin}
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .metrics import OPERATION_SECONDS
+
+# Used when the PricingRule table has no row that applies
+DEFAULT_MARGIN_PERCENT = float(os.environ.get("DEFAULT_MARGIN_PERCENT", "10"))
+# "best": price only the top match per requirement; "all": every match
+PRICING_SELECTION = os.environ.get("PRICING_SELECTION", "best").lower()
+
+
+# ---------------------------
+# Rules
+# ---------------------------
+class PriceBook:
+    """
+    PricingRule rows as sorted arrays, one tier table per category.
+    A line takes the tier of its category with the largest min_qty <=
+    its quantity; lines with no such tier use the category-less rules,
+    then DEFAULT_MARGIN_PERCENT with no discount.
+    """
+
+    def __init__(self, rules: Sequence[dict] = ()):
+        self.rules = sorted(
+            (
+                {
+                    "category": r.get("category") or None,
+                    "min_qty": float(r.get("min_qty") or 0.0),
+                    "discount_percent": float(r.get("discount_percent") or 0.0),
+                    "margin_percent": float(
+                        DEFAULT_MARGIN_PERCENT if r.get("margin_percent") is None
+                        else r["margin_percent"]
+                    ),
+                }
+                for r in rules
+            ),
+            key=lambda r: (r["category"] or "", r["min_qty"]),
+        )
+
+        # category -> (min_qty, discount fraction, margin fraction)
+        self.tiers: Dict[Optional[str], tuple] = {}
+        for cat in {r["category"] for r in self.rules}:
+            rows = [r for r in self.rules if r["category"] == cat]
+            self.tiers[cat] = (
+                np.array([r["min_qty"] for r in rows]),
+                np.array([r["discount_percent"] for r in rows]) / 100.0,
+                np.array([r["margin_percent"] for r in rows]) / 100.0,
+            )
+
+    def fingerprint(self) -> str:
+        return hashlib.sha256(
+            json.dumps([self.rules, DEFAULT_MARGIN_PERCENT], sort_keys=True).encode()
+        ).hexdigest()
+
+    def _apply(self, cat, mask, qty, discount, margin) -> np.ndarray:
+        """
+        Fill discount/margin for the masked lines from cat's tiers.
+        Returns the mask of lines that matched no tier.
+        """
+        min_qty, disc, marg = self.tiers[cat]
+        idx = np.searchsorted(min_qty, qty[mask], side="right") - 1
+        hit = idx >= 0
+        rows = np.flatnonzero(mask)[hit]
+        discount[rows] = disc[idx[hit]]
+        margin[rows] = marg[idx[hit]]
+        unmatched = np.zeros_like(mask)
+        unmatched[np.flatnonzero(mask)[~hit]] = True
+        return unmatched
+
+    def rates(self, categories: np.ndarray, qty: np.ndarray):
+        """
+        Per-line (discount fraction, margin fraction) arrays.
+        """
+        n = len(qty)
+        discount = np.zeros(n)
+        margin = np.full(n, DEFAULT_MARGIN_PERCENT / 100.0)
+        fallback = np.ones(n, dtype=bool)
+
+        # One vectorized tier lookup per category, not per line
+        for cat in self.tiers:
+            if cat is None:
+                continue
+            mask = categories == cat
+            if mask.any():
+                fallback &= ~mask
+                fallback |= self._apply(cat, mask, qty, discount, margin)
+
+        if None in self.tiers and fallback.any():
+            self._apply(None, fallback, qty, discount, margin)
+
+        return discount, margin
+
+
+def load_price_book() -> PriceBook:
+    from sqlmodel import select
+    from .db import get_session
+    from .models import PricingRule
+
+    with get_session() as session:
+        rows = session.exec(select(PricingRule)).all()
+    return PriceBook([r.model_dump() for r in rows])
+
+
+# ---------------------------
+# Line items
+# ---------------------------
+def _number(value, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class LineItems:
+    """
+    Matches as column arrays. Build once per tender, then price with any
+    number of PriceBooks (what-if repricing skips the dict parsing).
+    `group` is the requirement index; lines of a group are best-first.
+    """
+
+    def __init__(self, matches: Sequence[dict]):
+        self.sku = np.array([m.get("sku_code") for m in matches], dtype=object)
+        self.qty_raw = [m.get("quantity", 1) for m in matches]
+        # LLM-extracted quantities are not always numbers
+        self.qty = np.array([_number(q, 1.0) for q in self.qty_raw], dtype=float)
+        self.price = np.array(
+            [_number(m.get("price_base"), np.nan) for m in matches], dtype=float
+        )
+        self.category = np.array([m.get("category") for m in matches], dtype=object)
+        self.group = np.array([m.get("req", -1) for m in matches], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.qty)
+
+    def best_only(self) -> np.ndarray:
+        """
+        Indices of the first (best) line of every requirement; lines
+        without a requirement index are all kept.
+        """
+        grouped = np.flatnonzero(self.group >= 0)
+        _, first = np.unique(self.group[grouped], return_index=True)
+        keep = np.concatenate([grouped[first], np.flatnonzero(self.group < 0)])
+        keep.sort()
+        return keep
+
+
+def price_lines(
+    lines: LineItems,
+    book: Optional[PriceBook] = None,
+    selection: str = PRICING_SELECTION,
+) -> dict:
+    """
+    Price every selected line at once: base price less its tier
+    discount, times quantity, plus the tier margin on the subtotal.
+    """
+    started = time.perf_counter()
+    book = book or PriceBook()
+    idx = lines.best_only() if selection == "best" else np.arange(len(lines))
+
+    qty = lines.qty[idx]
+    # No price on the SKU: quote it at 0 rather than invent one
+    price = np.nan_to_num(lines.price[idx], nan=0.0)
+    discount, margin_rate = book.rates(lines.category[idx], qty)
+
+    amount = price * (1.0 - discount) * qty
+    margin = float(np.dot(amount, margin_rate))
+    subtotal = float(amount.sum())
+
+    line_items = [
+        {"sku": sku, "qty": lines.qty_raw[i], "amount": a}
+        for i, sku, a in zip(idx.tolist(), lines.sku[idx].tolist(), amount.tolist())
+    ]
+    OPERATION_SECONDS.observe(time.perf_counter() - started, op="pricing")
+    return {"line_items": line_items, "total": subtotal + margin, "margin": margin}
+
+
+def compute_pricing(matches, book: Optional[PriceBook] = None, selection: str = "all"):
+    """
+    Price match dicts ({sku_code, price_base, quantity, category?, req?}).
+    Returns {"line_items": [{sku, qty, amount}], "total", "margin"}.
+    """
+    return price_lines(LineItems(matches), book, selection)
+
+
+def margin_percent(pricing: dict) -> float:
+    subtotal = pricing["total"] - pricing["margin"]
+    return pricing["margin"] / subtotal * 100.0 if subtotal else DEFAULT_MARGIN_PERCENT
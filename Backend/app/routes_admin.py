@@ -1,25 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel import select, func
 from typing import Optional
-import os, uuid, json
+import json
+import httpx
 
 from .db import get_session
-from .auth_helpers import get_current_user
+from .auth_helpers import Principal, require_admin
 from .models import Tender, User, Application
-from .pipeline import run_pipeline
-from . import ai_agent
+from .jobs import job_queue
+from . import ai_agent, matcher, storage
+from .llm import cancel_on_disconnect
+from .pagination import Page, project
+from .metrics import log_event
 
 router = APIRouter()
-UPLOAD_DIR = "/app/out"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-# -------------------------------------------------
-# AUTH
-# -------------------------------------------------
-def require_admin(user: User = Depends(get_current_user)):
-    if user.role != "admin":
-        raise HTTPException(403, "Admin only")
-    return user
 
 # -------------------------------------------------
 # CREATE TENDER
@@ -30,15 +26,14 @@ async def create_tender(
     description: str = Form(...),
     published: bool = Form(True),
     file: Optional[UploadFile] = File(None),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     files = []
 
     if file:
-        fname = f"{uuid.uuid4()}_{file.filename}"
-        with open(os.path.join(UPLOAD_DIR, fname), "wb") as f:
-            f.write(await file.read())
-        files.append(fname)
+        # Streamed to disk in chunks, never held in memory whole
+        stored = await storage.save_upload(file)
+        files.append(stored["name"])
 
     with get_session() as session:
         tender = Tender(
@@ -51,63 +46,191 @@ async def create_tender(
         session.add(tender)
         session.commit()
         session.refresh(tender)
+        tender_id = tender.id
+
+    # Extraction/matching runs on the job workers, not on this request
+    job = job_queue.enqueue(tender_id)
+
+    return {"id": tender_id, "job_id": job["id"]}
+
+# -------------------------------------------------
+# PIPELINE JOBS
+# -------------------------------------------------
+@router.post("/tenders/{tender_id}/pipeline")
+def enqueue_pipeline(tender_id: int, admin: Principal = Depends(require_admin)):
+    with get_session() as session:
+        if not session.get(Tender, tender_id):
+            raise HTTPException(404, "Tender not found")
+
+    return job_queue.enqueue(tender_id)
+
+
+@router.get("/tenders/{tender_id}")
+def admin_get_tender(tender_id: int, admin: Principal = Depends(require_admin)):
+    with get_session() as session:
+        tender = session.get(Tender, tender_id)
+        if not tender:
+            raise HTTPException(404, "Tender not found")
+
+        return {
+            "id": tender.id,
+            "title": tender.title,
+            "description": tender.description,
+            "status": tender.status,
+            "pipeline_status": tender.pipeline_status,
+            "files": json.loads(tender.files) if tender.files else [],
+        }
+
+
+@router.get("/tenders/{tender_id}/pipeline")
+def tender_pipeline_status(tender_id: int, admin: Principal = Depends(require_admin)):
+    with get_session() as session:
+        tender = session.get(Tender, tender_id)
+        if not tender:
+            raise HTTPException(404, "Tender not found")
+        pipeline_status = tender.pipeline_status
+
+    return {
+        "tender_id": tender_id,
+        "pipeline_status": pipeline_status,
+        "job": job_queue.latest_for_tender(tender_id),
+    }
 
-        return {"id": tender.id}
+
+# -------------------------------------------------
+# SKU INDEX
+# -------------------------------------------------
+@router.post("/sku-index/reload")
+def reload_sku_index(admin: Principal = Depends(require_admin)):
+    # Snapshots from the catalog importer are also picked up on the next
+    # match; this forces it and reconciles with the SKU table
+    return matcher.reload_index()
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int, admin: Principal = Depends(require_admin)):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
 
 # -------------------------------------------------
 # LIST TENDERS
 # -------------------------------------------------
+ADMIN_TENDER_FIELDS = {
+    "id": Tender.id,
+    "title": Tender.title,
+    "description": Tender.description,
+    "status": Tender.status,
+    "applicant_count": func.count(Application.id),
+    "files": Tender.files,
+}
+
+ADMIN_TENDER_DECODERS = {
+    "files": lambda v: json.loads(v) if v else [],
+}
+
+
 @router.get("/tenders")
-def admin_list_tenders(admin: User = Depends(require_admin)):
-    with get_session() as session:
-        tenders = session.exec(
-            select(Tender).where(Tender.status == "public")
-        ).all()
+def admin_list_tenders(
+    response: Response,
+    status: Optional[str] = "public",
+    page: Page = Depends(),
+    admin: Principal = Depends(require_admin),
+):
+    names = page.columns(ADMIN_TENDER_FIELDS)
 
-        out = []
-        for t in tenders:
-            count = session.exec(
-                select(Application).where(Application.tender_id == t.id)
-            ).all()
+    stmt = select(Tender.id, *[ADMIN_TENDER_FIELDS[n] for n in names])
+    if "applicant_count" in names:
+        # One GROUP BY over this page instead of loading every application
+        stmt = (
+            stmt.outerjoin(Application, Application.tender_id == Tender.id)
+            .group_by(Tender.id)
+        )
+    if status:
+        stmt = stmt.where(Tender.status == status)
 
-            out.append({
-                "id": t.id,
-                "title": t.title,
-                "description": t.description,
-                "status": t.status,
-                "applicant_count": len(count),
-                "files": json.loads(t.files) if t.files else []
-            })
+    with get_session() as session:
+        rows = page.finish(session.exec(page.apply(stmt, Tender.id)).all(), response)
 
-        return out
+    return [project(names, row[1:], ADMIN_TENDER_DECODERS) for row in rows]
 
 # -------------------------------------------------
 # LIST APPLICATIONS
 # -------------------------------------------------
+ADMIN_APPLICATION_FIELDS = {
+    "id": Application.id,
+    "tender_id": Application.tender_id,
+    "user_email": User.email,
+    "tender_title": Tender.title,
+    "status": Application.status,
+}
+
+ADMIN_APPLICATION_DECODERS = {
+    "user_email": lambda v: v or "Unknown",
+    "tender_title": lambda v: v or "Unknown",
+    "status": lambda v: v or "submitted",
+}
+
+
 @router.get("/applications")
-def admin_list_applications(admin: User = Depends(require_admin)):
+def admin_list_applications(
+    response: Response,
+    status: Optional[str] = None,
+    tender_id: Optional[int] = None,
+    page: Page = Depends(),
+    admin: Principal = Depends(require_admin),
+):
+    names = page.columns(ADMIN_APPLICATION_FIELDS)
+
+    stmt = select(Application.id, *[ADMIN_APPLICATION_FIELDS[n] for n in names])
+    # Outer joins keep applications whose user/tender row is gone;
+    # skipped entirely when the projection does not need them
+    if "user_email" in names:
+        stmt = stmt.outerjoin(User, User.id == Application.user_id)
+    if "tender_title" in names:
+        stmt = stmt.outerjoin(Tender, Tender.id == Application.tender_id)
+    if status:
+        stmt = stmt.where(Application.status == status)
+    if tender_id is not None:
+        stmt = stmt.where(Application.tender_id == tender_id)
+
     with get_session() as session:
-        apps = session.exec(select(Application)).all()
-        users = {u.id: u for u in session.exec(select(User)).all()}
-        tenders = {t.id: t for t in session.exec(select(Tender)).all()}
+        rows = page.finish(session.exec(page.apply(stmt, Application.id)).all(), response)
 
-        return [
-            {
-                "id": a.id,
-                "tender_id": a.tender_id,
-                "user_email": users.get(a.user_id).email if a.user_id in users else "Unknown",
-                "tender_title": tenders.get(a.tender_id).title if a.tender_id in tenders else "Unknown",
-                "status": a.status or "submitted",
-            }
-            for a in apps
-        ]
+    return [project(names, row[1:], ADMIN_APPLICATION_DECODERS) for row in rows]
+
+
+# -------------------------------------------------
+# DASHBOARD COUNTERS
+# -------------------------------------------------
+@router.get("/stats")
+def admin_stats(admin: Principal = Depends(require_admin)):
+    with get_session() as session:
+        public_tenders = session.exec(
+            select(func.count(Tender.id)).where(Tender.status == "public")
+        ).one()
+
+        by_status = dict(
+            session.exec(
+                select(Application.status, func.count(Application.id))
+                .group_by(Application.status)
+            ).all()
+        )
+
+    return {
+        "tenders": public_tenders,
+        "applications": sum(by_status.values()),
+        "pending": by_status.get("submitted", 0),
+        "accepted": by_status.get("accepted", 0),
+    }
 
 
 # -------------------------------------------------
 # GET SINGLE APPLICATION
 # -------------------------------------------------
 @router.get("/applications/{application_id}")
-def get_application(application_id: int, admin: User = Depends(require_admin)):
+def get_application(application_id: int, admin: Principal = Depends(require_admin)):
     with get_session() as session:
         app = session.get(Application, application_id)
         if not app:
@@ -128,8 +251,11 @@ def get_application(application_id: int, admin: User = Depends(require_admin)):
 # -------------------------------------------------
 # AI SUMMARY
 # -------------------------------------------------
-@router.post("/tenders/{tender_id}/summary")
-def summarize_tender(tender_id: int, admin: User = Depends(require_admin)):
+def _summary_payload(tender_id: int):
+    """
+    Returns (applications payload, cache key, cached summary or None,
+    {application_id: cached digest} for map-reduce mode).
+    """
     with get_session() as session:
         tender = session.get(Tender, tender_id)
         if not tender:
@@ -139,11 +265,9 @@ def summarize_tender(tender_id: int, admin: User = Depends(require_admin)):
             select(Application, User)
             .where(Application.tender_id == tender_id)
             .where(Application.user_id == User.id)
+            .order_by(Application.id)
         ).all()
 
-        if not apps:
-            return {"error": "No applications to summarize"}
-
         payload = [
             {
                 "application_id": app.id,
@@ -153,14 +277,167 @@ def summarize_tender(tender_id: int, admin: User = Depends(require_admin)):
             for app, user in apps
         ]
 
-    # AI OUTSIDE DB
-    summary = ai_agent.build_user_summary(payload)
+        key = ai_agent.summary_cache_key(tender_id, payload)
+        cached = None
+        if tender.summary_key == key and tender.summary_json:
+            cached = json.loads(tender.summary_json)
+
+        digests = {}
+        for (app, _), item in zip(apps, payload):
+            if app.digest_json and app.digest_key == ai_agent.digest_cache_key(item):
+                digests[app.id] = json.loads(app.digest_json)
+
+        return payload, key, cached, digests
+
 
+def _save_summary(tender_id: int, summary: dict, key: Optional[str] = None) -> None:
     with get_session() as session:
         tender = session.get(Tender, tender_id)
         tender.summary_json = json.dumps(summary)
+        tender.summary_key = key
         session.commit()
 
+
+def _summary_key(summary: dict, key: str) -> Optional[str]:
+    # A partial summary (failed map or reduce call) is shown once but
+    # stored without its key, so the next request tries again
+    return None if summary.get("partial") else key
+
+
+def _save_digests(payload: list, digests: dict) -> None:
+    if not digests:
+        return
+
+    by_id = {a["application_id"]: a for a in payload}
+    with get_session() as session:
+        for app_id, digest in digests.items():
+            app = session.get(Application, app_id)
+            if app is None:
+                continue
+            app.digest_json = json.dumps(digest)
+            app.digest_key = ai_agent.digest_cache_key(by_id[app_id])
+        session.commit()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_summary(tender_id: int, payload: list, key: str):
+    """
+    SSE stream: "token" events with partial text, then one "summary"
+    event with the parsed result (or an "error" event).
+    """
+    parts = []
+    try:
+        async for chunk in ai_agent.astream_user_summary(payload):
+            parts.append(chunk)
+            yield _sse("token", {"text": chunk})
+
+        summary = ai_agent.parse_summary("".join(parts))
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+        return
+
+    await run_in_threadpool(_save_summary, tender_id, summary, key)
+    yield _sse("summary", summary)
+
+
+async def _stream_map_reduce(tender_id: int, payload: list, key: str, cached_digests: dict):
+    """
+    SSE stream for map-reduce mode: one "digest" event per application
+    as it is evaluated, "token" events from the reduce step, then the
+    "summary" event. An LLM timeout ends the stream with an "error"
+    event instead.
+    """
+    digests, fresh = {}, {}
+    try:
+        async for app_id, digest, is_fresh in ai_agent.adigest_applications(payload, cached_digests):
+            digests[app_id] = digest
+            if is_fresh:
+                fresh[app_id] = digest
+            yield _sse("digest", digest)
+    except httpx.TimeoutException:
+        # Digests finished before the timeout are still valid
+        await run_in_threadpool(_save_digests, payload, fresh)
+        yield _sse("error", {"detail": "AI summary timed out"})
+        return
+
+    await run_in_threadpool(_save_digests, payload, fresh)
+
+    ordered = [digests[a["application_id"]] for a in payload]
+    raw = None
+    if len(ordered) > 1:
+        parts = []
+        try:
+            async for chunk in ai_agent.astream_reduce(ordered):
+                parts.append(chunk)
+                yield _sse("token", {"text": chunk})
+            raw = "".join(parts)
+        except httpx.TimeoutException:
+            yield _sse("error", {"detail": "AI summary timed out"})
+            return
+        except Exception as e:
+            log_event("summary_reduce_failed", tender_id=tender_id, error=f"{type(e).__name__}: {e}")
+
+    summary = ai_agent.reduce_summary(raw, ordered)
+    await run_in_threadpool(_save_summary, tender_id, summary, _summary_key(summary, key))
+    yield _sse("summary", summary)
+
+
+@router.post("/tenders/{tender_id}/summary")
+async def summarize_tender(
+    tender_id: int,
+    request: Request,
+    stream: bool = False,
+    refresh: bool = False,
+    admin: Principal = Depends(require_admin),
+):
+    # DB work stays on the threadpool; the LLM wait does not hold a thread
+    payload, key, cached, digests = await run_in_threadpool(_summary_payload, tender_id)
+
+    if not payload:
+        return {"error": "No applications to summarize"}
+
+    # Same applications, model and prompt as last time: reuse it
+    if cached is not None and not refresh:
+        return cached
+
+    map_reduce = ai_agent.summary_mode(payload) == "map_reduce"
+    if refresh:
+        digests = {}
+
+    if stream:
+        if map_reduce:
+            body = _stream_map_reduce(tender_id, payload, key, digests)
+        else:
+            body = _stream_summary(tender_id, payload, key)
+
+        return StreamingResponse(
+            body,
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                # Stop nginx from buffering the stream
+                "X-Accel-Buffering": "no",
+            },
+        )
+
+    try:
+        if map_reduce:
+            summary, fresh = await cancel_on_disconnect(
+                request, ai_agent.amap_reduce_summary(payload, digests)
+            )
+            await run_in_threadpool(_save_digests, payload, fresh)
+        else:
+            summary = await cancel_on_disconnect(
+                request, ai_agent.abuild_user_summary(payload)
+            )
+    except httpx.TimeoutException:
+        raise HTTPException(504, "AI summary timed out")
+
+    await run_in_threadpool(_save_summary, tender_id, summary, _summary_key(summary, key))
+
     return summary
 
 # -------------------------------------------------
@@ -170,7 +447,7 @@ def summarize_tender(tender_id: int, admin: User = Depends(require_admin)):
 def send_offer(
     application_id: int,
     data: dict,
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     message = data.get("message")
     if not isinstance(message, str) or not message.strip():
@@ -192,23 +469,38 @@ def send_offer(
 # ---------------------------
 # ACCEPTED OFFERS (ADMIN)
 # ---------------------------
+ACCEPTED_OFFER_FIELDS = {
+    "application_id": Application.id,
+    "applicant_email": User.email,
+    "tender_title": Tender.title,
+    "offer": Application.offer_json,
+    "status": Application.status,
+}
+
+ACCEPTED_OFFER_DECODERS = {
+    "offer": lambda v: json.loads(v) if v else None,
+}
+
+
 @router.get("/accepted-offers")
-def admin_accepted_offers(admin: User = Depends(require_admin)):
+def admin_accepted_offers(
+    response: Response,
+    tender_id: Optional[int] = None,
+    page: Page = Depends(),
+    admin: Principal = Depends(require_admin),
+):
+    names = page.columns(ACCEPTED_OFFER_FIELDS)
+
+    stmt = (
+        select(Application.id, *[ACCEPTED_OFFER_FIELDS[n] for n in names])
+        .where(Application.status == "accepted")
+        .where(Application.user_id == User.id)
+        .where(Application.tender_id == Tender.id)
+    )
+    if tender_id is not None:
+        stmt = stmt.where(Application.tender_id == tender_id)
+
     with get_session() as session:
-        rows = session.exec(
-            select(Application, User, Tender)
-            .where(Application.status == "accepted")
-            .where(Application.user_id == User.id)
-            .where(Application.tender_id == Tender.id)
-        ).all()
+        rows = page.finish(session.exec(page.apply(stmt, Application.id)).all(), response)
 
-        return [
-            {
-                "application_id": app.id,
-                "applicant_email": user.email,
-                "tender_title": tender.title,
-                "offer": json.loads(app.offer_json) if app.offer_json else None,
-                "status": app.status,
-            }
-            for app, user, tender in rows
-        ]
+    return [project(names, row[1:], ACCEPTED_OFFER_DECODERS) for row in rows]
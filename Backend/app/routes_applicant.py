@@ -1,11 +1,13 @@
 import json
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlmodel import select
-from typing import cast
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, cast
 
 from .models import Application, Tender, User
 from .db import get_session
-from .auth_helpers import get_current_user, require_applicant
+from .auth_helpers import Principal, get_current_user, require_applicant
+from .pagination import Page, project
 
 router = APIRouter(tags=["Applicant"])
 
@@ -13,7 +15,7 @@ router = APIRouter(tags=["Applicant"])
 # SUBMIT APPLICATION
 # --------------------------------------------------
 @router.post("/submit_application")
-def submit_application(data: dict, user: User = Depends(require_applicant)):
+def submit_application(data: dict, user: Principal = Depends(require_applicant)):
     if user.id is None:
         raise HTTPException(500, "Authenticated user has no ID")
 
@@ -51,7 +53,14 @@ def submit_application(data: dict, user: User = Depends(require_applicant)):
         )
 
         session.add(app)
-        session.commit()
+        # A new application makes the tender's cached AI summary stale
+        tender.summary_key = None
+        try:
+            session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent submit (unique tender/user index)
+            session.rollback()
+            raise HTTPException(400, "You have already applied")
         session.refresh(app)
 
         return {
@@ -62,26 +71,41 @@ def submit_application(data: dict, user: User = Depends(require_applicant)):
 # --------------------------------------------------
 # APPLICANT NOTIFICATIONS
 # --------------------------------------------------
+NOTIFICATION_FIELDS = {
+    "application_id": Application.id,
+    "tender_id": Application.tender_id,
+    "offer": Application.offer_json,
+}
+
+NOTIFICATION_DECODERS = {
+    "offer": lambda v: json.loads(v) if v else None,
+}
+
+
 @router.get("/notifications")
-def applicant_notifications(user: User = Depends(get_current_user)):
+def applicant_notifications(
+    response: Response,
+    tender_id: Optional[int] = None,
+    page: Page = Depends(),
+    user: User = Depends(get_current_user),
+):
     if user.id is None:
         raise HTTPException(500, "Authenticated user has no ID")
 
+    names = page.columns(NOTIFICATION_FIELDS)
+
+    stmt = (
+        select(Application.id, *[NOTIFICATION_FIELDS[n] for n in names])
+        .where(Application.user_id == user.id)
+        .where(Application.status == "offered")
+    )
+    if tender_id is not None:
+        stmt = stmt.where(Application.tender_id == tender_id)
+
     with get_session() as session:
-        apps = session.exec(
-            select(Application)
-            .where(Application.user_id == user.id)
-            .where(Application.status == "offered")
-        ).all()
+        rows = page.finish(session.exec(page.apply(stmt, Application.id)).all(), response)
 
-        return [
-            {
-                "application_id": a.id,
-                "tender_id": a.tender_id,
-                "offer": json.loads(a.offer_json) if a.offer_json else None,
-            }
-            for a in apps
-        ]
+    return [project(names, row[1:], NOTIFICATION_DECODERS) for row in rows]
 
 # --------------------------------------------------
 # ACCEPT / REJECT OFFER
@@ -90,7 +114,7 @@ def applicant_notifications(user: User = Depends(get_current_user)):
 def respond_to_offer(
     application_id: int,
     decision: str,
-    user: User = Depends(require_applicant),
+    user: Principal = Depends(require_applicant),
 ):
     if decision not in ("accept", "reject"):
         raise HTTPException(400, "Decision must be 'accept' or 'reject'")
@@ -118,28 +142,31 @@ def respond_to_offer(
 # ACCEPTED OFFERS (APPLICANT)
 # ---------------------------
 @router.get("/accepted")
-def applicant_accepted(user: User = Depends(require_applicant)):
+def applicant_accepted(user: Principal = Depends(require_applicant)):
     if user.id is None:
         raise HTTPException(500, "User has no ID")
 
     with get_session() as session:
-        apps = session.exec(
-            select(Application)
+        rows = session.exec(
+            select(
+                Application.id,
+                Application.offer_json,
+                Application.status,
+                Tender.title,
+            )
+            .outerjoin(Tender, Tender.id == Application.tender_id)
             .where(Application.user_id == user.id)
             .where(Application.status == "accepted")
         ).all()
 
-        result = []
-        for a in apps:
-            tender = session.get(Tender, a.tender_id)
-
-            result.append({
-                "application_id": a.id,
-                "tender_title": tender.title if tender else "Unknown",
-                "offer": json.loads(a.offer_json) if a.offer_json else None,
-                "status": a.status
-            })
-
-        return result
+        return [
+            {
+                "application_id": app_id,
+                "tender_title": title or "Unknown",
+                "offer": json.loads(offer_json) if offer_json else None,
+                "status": status
+            }
+            for app_id, offer_json, status, title in rows
+        ]
 
 
@@ -1,14 +1,65 @@
-from fastapi import APIRouter, HTTPException, Depends
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import select
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 
 from .models import User
 from .db import get_session
 from .auth_helpers import get_current_user
-from .auth_utils import hash_password, verify_password, create_token
+from .auth_utils import (
+    PasswordPoolBusy,
+    ahash_password,
+    averify_and_update,
+    create_token,
+)
 
 router = APIRouter()
 
+# Logins one client IP may have in flight at once
+LOGIN_MAX_CONCURRENT_PER_IP = int(os.environ.get("LOGIN_MAX_CONCURRENT_PER_IP", "4"))
+
+
+class PerKeyLimiter:
+    """
+    Caps concurrent calls per key (client IP). Over the cap is an
+    immediate 429 rather than a wait, so one client cannot fill the
+    password pool.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+
+    @contextmanager
+    def slot(self, key: str):
+        with self._lock:
+            if self._active.get(key, 0) >= self.limit:
+                raise HTTPException(429, "Too many login attempts in progress")
+            self._active[key] = self._active.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                left = self._active[key] - 1
+                if left:
+                    self._active[key] = left
+                else:
+                    del self._active[key]
+
+
+login_limiter = PerKeyLimiter(LOGIN_MAX_CONCURRENT_PER_IP)
+
+
+def client_ip(request: Request) -> str:
+    # Direct peer only; X-Forwarded-For is client-controlled
+    return request.client.host if request.client else "unknown"
+
 
 # =========================
 # CURRENT USER
@@ -31,33 +82,55 @@ class RegisterRequest(BaseModel):
     role: str
 
 
-@router.post("/register")
-def register_user(data: RegisterRequest):
-    if data.role not in ("admin", "applicant"):
-        raise HTTPException(400, "Invalid role")
-
+def _find_user(email: str) -> Optional[User]:
     with get_session() as session:
-        existing = session.exec(
-            select(User).where(User.email == data.email)
-        ).first()
+        return session.exec(select(User).where(User.email == email)).first()
 
-        if existing:
-            raise HTTPException(400, "Email already registered")
 
-        user = User(
-            email=data.email,
-            hashed_password=hash_password(data.password),
-            role=data.role,
-        )
+def _create_user(email: str, hashed_password: str, role: str) -> int:
+    with get_session() as session:
+        if session.exec(select(User).where(User.email == email)).first():
+            raise HTTPException(400, "Email already registered")
 
+        user = User(email=email, hashed_password=hashed_password, role=role)
         session.add(user)
-        session.commit()
+        try:
+            session.commit()
+        except IntegrityError:
+            # Concurrent registration of the same email won the race
+            raise HTTPException(400, "Email already registered")
         session.refresh(user)
+        return user.id
+
 
-        return {
-            "status": "registered",
-            "user_id": user.id,
-        }
+def _update_password_hash(user_id: int, hashed_password: str) -> None:
+    with get_session() as session:
+        user = session.get(User, user_id)
+        if user is not None:
+            user.hashed_password = hashed_password
+            session.commit()
+
+
+@router.post("/register")
+async def register_user(data: RegisterRequest):
+    if data.role not in ("admin", "applicant"):
+        raise HTTPException(400, "Invalid role")
+
+    # Cheap check first so taken emails do not cost a bcrypt hash
+    if await run_in_threadpool(_find_user, data.email):
+        raise HTTPException(400, "Email already registered")
+
+    try:
+        hashed = await ahash_password(data.password)
+    except PasswordPoolBusy:
+        raise HTTPException(503, "Server busy, try again shortly")
+
+    user_id = await run_in_threadpool(_create_user, data.email, hashed, data.role)
+
+    return {
+        "status": "registered",
+        "user_id": user_id,
+    }
 
 
 # =========================
@@ -69,24 +142,32 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/login")
-def login(data: LoginRequest):
-    with get_session() as session:
-        user = session.exec(
-            select(User).where(User.email == data.email)
-        ).first()
+async def login(data: LoginRequest, request: Request):
+    with login_limiter.slot(client_ip(request)):
+        user = await run_in_threadpool(_find_user, data.email)
 
         if not user:
             raise HTTPException(401, "Invalid credentials")
 
-        if not verify_password(data.password, user.hashed_password):
+        # bcrypt runs in the password process pool, off the API threads
+        try:
+            ok, new_hash = await averify_and_update(data.password, user.hashed_password)
+        except PasswordPoolBusy:
+            raise HTTPException(503, "Server busy, try again shortly")
+
+        if not ok:
             raise HTTPException(401, "Invalid credentials")
 
-        token = create_token({
-            "sub": str(user.id),
-            "role": user.role,
-        })
+        # Stored hash predates the current BCRYPT_ROUNDS: upgrade it
+        if new_hash:
+            await run_in_threadpool(_update_password_hash, user.id, new_hash)
 
-        return {
-            "access_token": token,
-            "token_type": "bearer",
-        }
+    token = create_token({
+        "sub": str(user.id),
+        "role": user.role,
+    })
+
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+    }
@@ -1,40 +1,67 @@
-from fastapi import APIRouter
+import os
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from sqlmodel import select
-from typing import cast
-from fastapi.responses import FileResponse
+from typing import Optional
 
 from .models import Tender
 from .db import get_session
+from .pagination import Page, project
+from . import storage
+from .metrics import render_metrics
 
 router = APIRouter()
 
+# Optional bearer token for /metrics; unset leaves it open (scrape from
+# the internal network only)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
 
 # =========================
 # PUBLIC TENDERS
 # =========================
+PUBLIC_TENDER_FIELDS = {
+    "id": Tender.id,
+    "title": Tender.title,
+    "description": Tender.description,
+    "status": Tender.status,
+}
+
+
 @router.get("/tenders")
-def list_tenders():
+def list_tenders(
+    response: Response,
+    status: Optional[str] = None,
+    page: Page = Depends(),
+):
+    names = page.columns(PUBLIC_TENDER_FIELDS)
+
+    stmt = select(Tender.id, *[PUBLIC_TENDER_FIELDS[n] for n in names])
+    if status:
+        stmt = stmt.where(Tender.status == status)
+
     with get_session() as session:
-        tenders = session.exec(select(Tender)).all()
+        rows = page.finish(session.exec(page.apply(stmt, Tender.id)).all(), response)
 
-        return [
-            {
-                "id": cast(int, t.id),
-                "title": t.title,
-                "description": t.description,
-                "status": t.status,
-            }
-            for t in tenders
-        ]
+    return [project(names, row[1:]) for row in rows]
 
 
 # =========================
 # DOWNLOAD FILE
 # =========================
 @router.get("/download/{filename}")
-def download_file(filename: str):
-    file_path = f"/app/out/{filename}"
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-    )
+def download_file(filename: str, request: Request):
+    return storage.file_response(filename, request)
+
+
+# =========================
+# METRICS (Prometheus)
+# =========================
+@router.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if METRICS_TOKEN:
+        auth = request.headers.get("authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,18 +1,227 @@
 # backend/app/seed_skus.py
+import os
+import csv
+import sys
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+from sqlalchemy import insert, update
+from sqlmodel import select
+
 from .db import get_session, init_db
 from .models import SKU
+from . import matcher
+from .metrics import log_event
+
+# Rows per transaction when importing a catalog
+SKU_IMPORT_BATCH = int(os.environ.get("SKU_IMPORT_BATCH", "5000"))
+
+# SQLite IN (...) lists are capped, so lookups go in slices
+_LOOKUP_CHUNK = 500
+
+_COLUMNS = ("sku_code", "description", "specs_json", "price_base", "category")
+_FIELDS = _COLUMNS[1:]
+
+# One encoder for every row (json.dumps builds one per call with sort_keys)
+_encode_specs = json.JSONEncoder(sort_keys=True).encode
+
+EXAMPLES = [
+    {"sku_code":"LAPTOP123","description":"Laptop i7 16GB 512SSD","price_base":45000},
+    {"sku_code":"LAPTOP124","description":"Laptop i5 8GB 256SSD","price_base":30000},
+    {"sku_code":"MON100","description":"24 inch monitor","price_base":8000},
+]
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+def iter_catalog(path: str) -> Iterator[dict]:
+    """
+    Stream raw rows from a .csv (header row required) or .jsonl file.
+    """
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+
+def normalize_row(row: dict) -> Optional[dict]:
+    """
+    Row -> SKU column values, or None when it has no usable code/price.
+    Columns other than the SKU fields are kept as specs_json.
+    """
+    code = str(row.get("sku_code") or "").strip()
+    if not code:
+        return None
+
+    price = row.get("price_base")
+    try:
+        price = float(price) if price not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        return None
+
+    specs = row.get("specs_json")
+    if specs is None:
+        extra = row.get("specs")
+        if extra is None:
+            extra = {
+                k: v for k, v in row.items()
+                if k and k not in _COLUMNS and v not in (None, "")
+            }
+        specs = _encode_specs(extra) if extra else None
+    elif not isinstance(specs, str):
+        specs = _encode_specs(specs)
+
+    return {
+        "sku_code": code,
+        "description": str(row.get("description") or "").strip(),
+        "specs_json": specs,
+        "price_base": price,
+        "category": str(row.get("category") or "").strip() or None,
+    }
+
+
+# ---------------------------
+# Upsert
+# ---------------------------
+def _existing(session, codes: List[str]) -> Dict[str, tuple]:
+    """
+    sku_code -> (id, description, specs_json, price_base, category).
+    """
+    found: Dict[str, tuple] = {}
+    for i in range(0, len(codes), _LOOKUP_CHUNK):
+        rows = session.exec(
+            select(SKU.sku_code, SKU.id, SKU.description, SKU.specs_json, SKU.price_base, SKU.category)
+            .where(SKU.sku_code.in_(codes[i:i + _LOOKUP_CHUNK]))
+        ).all()
+        for code, *values in rows:
+            found[code] = tuple(values)
+    return found
+
+
+def upsert_batch(rows: Iterable[dict]) -> dict:
+    """
+    Insert new SKUs and update changed ones in one transaction; rows
+    identical to what is stored are not written. Returns counts plus
+    the ids whose description (the embedded text) is new or changed.
+    """
+    # Last row wins when a code repeats inside the batch
+    by_code = {r["sku_code"]: r for r in rows}
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "reembed": []}
+    if not by_code:
+        return stats
 
+    with get_session() as session:
+        current = _existing(session, list(by_code))
+
+        new_rows, changed, reembed_codes = [], [], []
+        for code, row in by_code.items():
+            old = current.get(code)
+            if old is None:
+                new_rows.append(row)
+                reembed_codes.append(code)
+            elif old[1:] != tuple(row[k] for k in _FIELDS):
+                changed.append({"id": old[0], **row})
+                if old[1] != row["description"]:
+                    stats["reembed"].append(old[0])
+            else:
+                stats["unchanged"] += 1
+
+        # Executemany bulk statements, not one ORM object per row
+        if new_rows:
+            session.execute(insert(SKU), new_rows)
+        if changed:
+            session.execute(update(SKU), changed)
+
+        if reembed_codes:
+            stats["reembed"].extend(v[0] for v in _existing(session, reembed_codes).values())
+
+        session.commit()
+
+    stats["inserted"] = len(new_rows)
+    stats["updated"] = len(changed)
+    return stats
+
+
+def import_catalog(path: str, batch_size: int = SKU_IMPORT_BATCH) -> dict:
+    """
+    Stream a CSV/JSONL catalog into the SKU table in batch_size
+    transactions. Safe to re-run: unchanged rows are skipped.
+    """
+    totals = {"rows": 0, "skipped": 0, "inserted": 0, "updated": 0, "unchanged": 0, "reembed": []}
+    batch: List[dict] = []
+
+    def flush():
+        stats = upsert_batch(batch)
+        for k in ("inserted", "updated", "unchanged"):
+            totals[k] += stats[k]
+        totals["reembed"].extend(stats["reembed"])
+        batch.clear()
+
+    for raw in iter_catalog(path):
+        totals["rows"] += 1
+        row = normalize_row(raw)
+        if row is None:
+            totals["skipped"] += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return totals
+
+
+def reindex(sku_ids: List[int]) -> None:
+    """
+    Re-embed only the given SKUs. If the index is not in memory yet,
+    warm_index() loads the snapshot and reconciles it by content hash,
+    which picks up the same changes.
+    """
+    if not matcher.sku_index.loaded:
+        matcher.warm_index()
+        return
+
+    for i in range(0, len(sku_ids), _LOOKUP_CHUNK):
+        with get_session() as session:
+            skus = session.exec(
+                select(SKU).where(SKU.id.in_(sku_ids[i:i + _LOOKUP_CHUNK]))
+            ).all()
+        matcher.upsert_skus(skus)
+    matcher.sku_index.snapshot()
+
+
+# ---------------------------
+# Startup seed
+# ---------------------------
 def seed():
+    """
+    Example SKUs for an empty install. Does nothing once the catalog
+    has any rows, so restarts no longer add duplicates.
+    """
     init_db()
-    s = get_session()
-    examples = [
-        {"sku_code":"LAPTOP123","description":"Laptop i7 16GB 512SSD","price_base":45000},
-        {"sku_code":"LAPTOP124","description":"Laptop i5 8GB 256SSD","price_base":30000},
-        {"sku_code":"MON100","description":"24 inch monitor","price_base":8000},
-    ]
-    for e in examples:
-        s.add(SKU(**e))
-    s.commit()
+    with get_session() as session:
+        if session.exec(select(SKU.id).limit(1)).first() is not None:
+            return
+    upsert_batch(normalize_row(e) for e in EXAMPLES)
+
 
 if __name__ == "__main__":
-    seed()
+    # python -m app.seed_sku [catalog.csv | catalog.jsonl]
+    if len(sys.argv) > 1:
+        init_db()
+        result = import_catalog(sys.argv[1])
+        reindex(result["reembed"])
+        log_event(
+            "catalog_imported", path=sys.argv[1], rows=result["rows"],
+            inserted=result["inserted"], updated=result["updated"],
+            unchanged=result["unchanged"], skipped=result["skipped"],
+            reembedded=len(result["reembed"]),
+        )
+        # A running API reloads the new snapshot on its next match (or
+        # POST /admin/sku-index/reload)
+    else:
+        seed()
@@ -0,0 +1,160 @@
+# backend/app/storage.py
+import os
+import re
+import uuid
+import hashlib
+from typing import Optional
+
+import aiofiles
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, Response
+
+# Uploaded tender documents. Each distinct file content is stored once
+# as blobs/<sha256>; the name handed out is "<sha256>_<original name>",
+# so identical uploads share a blob but keep their own download name.
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "/app/out")
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+for d in (UPLOAD_DIR, BLOB_DIR, TMP_DIR):
+    os.makedirs(d, exist_ok=True)
+
+_STORED_NAME = re.compile(r"^([0-9a-f]{64})_(.+)$")
+
+
+def safe_name(filename: Optional[str]) -> str:
+    """
+    Basename with anything outside [A-Za-z0-9._-] replaced, so it is
+    safe in a path, a URL and a Content-Disposition header.
+    """
+    name = os.path.basename(filename or "") or "file"
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._") or "file"
+    return name[:150]
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256)
+
+
+# ---------------------------
+# Upload
+# ---------------------------
+async def save_upload(upload: UploadFile) -> dict:
+    """
+    Stream an upload to disk in UPLOAD_CHUNK_BYTES pieces, hashing as it
+    goes, and file it under its content hash. Raises 413 past
+    MAX_UPLOAD_BYTES. Returns {"name", "sha256", "size"}.
+    """
+    tmp = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    h = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(tmp, "wb") as out:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        413, f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+                    )
+                h.update(chunk)
+                await out.write(chunk)
+
+        sha = h.hexdigest()
+        dest = blob_path(sha)
+        if os.path.exists(dest):
+            # Same bytes already stored: keep the existing blob
+            os.remove(tmp)
+        else:
+            os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        await upload.close()
+
+    return {
+        "name": f"{sha}_{safe_name(upload.filename)}",
+        "sha256": sha,
+        "size": size,
+    }
+
+
+# ---------------------------
+# Lookup
+# ---------------------------
+def resolve(name: str) -> Optional[dict]:
+    """
+    Map a stored name to {"path", "sha256", "filename"}, or None.
+    Names from before content addressing ("<uuid>_<name>") are plain
+    files in UPLOAD_DIR and have no sha256.
+    """
+    if not name or name != os.path.basename(name) or name.startswith("."):
+        return None
+
+    m = _STORED_NAME.match(name)
+    if m:
+        path = blob_path(m.group(1))
+        if os.path.isfile(path):
+            return {"path": path, "sha256": m.group(1), "filename": m.group(2)}
+        return None
+
+    path = os.path.join(UPLOAD_DIR, name)
+    if os.path.isfile(path):
+        return {"path": path, "sha256": None, "filename": name}
+    return None
+
+
+def path_for(name: str) -> Optional[str]:
+    found = resolve(name)
+    return found["path"] if found else None
+
+
+# ---------------------------
+# Download
+# ---------------------------
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(t.removeprefix("W/") == etag for t in tags)
+
+
+def file_response(name: str, request: Request) -> Response:
+    """
+    Serve a stored file with ETag / If-None-Match revalidation. Range
+    and If-Range requests are answered by FileResponse itself.
+    """
+    found = resolve(name)
+    if not found:
+        raise HTTPException(404, "File not found")
+
+    stat = os.stat(found["path"])
+    if found["sha256"]:
+        # Content-addressed: the name can never point at other bytes
+        etag = f'"{found["sha256"]}"'
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        etag = f'"{int(stat.st_mtime)}-{stat.st_size}"'
+        cache_control = "no-cache"
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    inm = request.headers.get("if-none-match")
+    if inm and _etag_matches(inm, etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(
+        path=found["path"],
+        filename=found["filename"],
+        headers=headers,
+        stat_result=stat,
+    )
@@ -0,0 +1,414 @@
+# backend/bench/run.py
+"""
+Benchmark harness: catalog import, matcher build/search, pricing,
+run_pipeline stage timings and list-endpoint latency under load.
+
+Runs against a throwaway SQLite database, FAISS snapshot and output
+directory, with a stub Ollama server (no model, no network). Results
+go out as one JSON document, so two commits can be compared with a
+plain diff or a script.
+
+    cd Backend
+    python -m bench.run --scale small --out bench-small.json
+    python -m bench.run --skus 200000 --only matcher,pricing
+
+These are benchmarks, not tests: nothing here asserts on the numbers.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+from .stub_ollama import StubOllama
+from . import synthetic
+
+SCALES = {
+    "small": {"skus": 1_000, "tenders": 100, "applications": 1_000},
+    "medium": {"skus": 100_000, "tenders": 10_000, "applications": 100_000},
+    "large": {"skus": 1_000_000, "tenders": 100_000, "applications": 1_000_000},
+}
+SECTIONS = ("matcher", "pricing", "pipeline", "api")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Summary of durations in seconds, reported in milliseconds.
+    """
+    if not samples:
+        return {"count": 0}
+    arr = np.asarray(samples) * 1000.0
+    return {
+        "count": len(samples),
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def configure_env(workdir: str, stub: StubOllama, args) -> None:
+    """
+    Point every app setting that touches disk or the network at the
+    sandbox. Must run before the first `import app...`.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["FAISS_INDEX_FILE"] = os.path.join(workdir, "faiss.index")
+    os.environ["PROPOSAL_DIR"] = os.path.join(workdir, "proposals")
+    os.environ["OLLAMA_BASE"] = stub.url
+    os.environ.setdefault("EMBED_BACKEND", args.embed_backend)
+    os.environ.setdefault("EMBED_DIM", str(args.embed_dim))
+
+
+# ---------------------------
+# Matcher
+# ---------------------------
+def bench_matcher(args) -> dict:
+    from sqlmodel import select
+    from app import matcher
+    from app.db import get_session
+    from app.models import SKU
+
+    with get_session() as session:
+        skus = session.exec(select(SKU)).all()
+
+    started = time.perf_counter()
+    ids, vectors, hashes = matcher.embed_skus(skus)
+    embed_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matcher.sku_index.rebuild(ids, vectors, hashes)
+    matcher.sku_index.loaded = True
+    build_s = time.perf_counter() - started
+    matcher.sku_index.snapshot()
+
+    rng = np.random.default_rng(args.seed)
+    queries = rng.random((args.queries, args.embed_dim), dtype=np.float32).tolist()
+
+    # One big batch (pipeline style) and single queries (latency)
+    started = time.perf_counter()
+    matcher.sku_index.search_batch(queries, top_k=3)
+    batch_s = time.perf_counter() - started
+
+    single = []
+    for q in queries[: min(len(queries), 1000)]:
+        t = time.perf_counter()
+        matcher.sku_index.search(q, top_k=3)
+        single.append(time.perf_counter() - t)
+
+    return {
+        "skus": len(skus),
+        "index_kind": matcher.sku_index.active_kind,
+        "metric": matcher.sku_index.metric,
+        "embed_s": embed_s,
+        "embed_per_s": len(skus) / embed_s if embed_s else None,
+        "build_s": build_s,
+        "batch_queries": len(queries),
+        "batch_search_qps": len(queries) / batch_s if batch_s else None,
+        "single_search": percentiles(single),
+    }
+
+
+# ---------------------------
+# Pricing
+# ---------------------------
+def bench_pricing(args) -> dict:
+    from app import pricing
+
+    rng = np.random.default_rng(args.seed)
+    cats = list(synthetic.CATEGORIES)
+    matches = [
+        {
+            "sku_code": f"SKU-{i:07d}",
+            "price_base": float(rng.uniform(50, 50000)),
+            "quantity": int(rng.integers(1, 300)),
+            "category": cats[i % len(cats)],
+            "req": i // 3,
+        }
+        for i in range(args.price_lines)
+    ]
+    book = pricing.PriceBook(synthetic.PRICING_RULES)
+
+    def timed(fn, repeat: int = 5) -> Dict[str, float]:
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t)
+        return percentiles(samples)
+
+    lines = pricing.LineItems(matches)
+    return {
+        "lines": len(matches),
+        "compute_pricing": timed(lambda: pricing.compute_pricing(matches, book)),
+        "line_arrays": timed(lambda: pricing.LineItems(matches)),
+        # What-if repricing: arrays built once, priced again
+        "reprice_all": timed(lambda: pricing.price_lines(lines, book, "all")),
+        "reprice_best": timed(lambda: pricing.price_lines(lines, book, "best")),
+    }
+
+
+# ---------------------------
+# Pipeline
+# ---------------------------
+def bench_pipeline(args, stub: StubOllama) -> dict:
+    from app import pipeline, consolidator
+
+    timings: Dict[str, List[float]] = defaultdict(list)
+    skipped: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def listener(tender_id, stage, seconds, was_skipped):
+        with lock:
+            timings[stage].append(seconds)
+            skipped[stage] += int(was_skipped)
+
+    pipeline.stage_listeners.append(listener)
+    tender_ids = list(range(1, min(args.pipeline_tenders, args.tenders) + 1))
+
+    def run() -> dict:
+        timings.clear()
+        skipped.clear()
+        before = dict(stub.counts)
+        totals = []
+        for tid in tender_ids:
+            t = time.perf_counter()
+            pipeline.run_pipeline(tid)
+            totals.append(time.perf_counter() - t)
+
+        # Proposals render off the critical path; wait for them so the
+        # proposal stage is in the numbers
+        deadline = time.time() + 120
+        while len(timings["proposal"]) < len(tender_ids) and time.time() < deadline:
+            time.sleep(0.05)
+
+        return {
+            "run_pipeline": percentiles(totals),
+            "stages": {
+                stage: {**percentiles(samples), "skipped": skipped[stage]}
+                for stage, samples in sorted(timings.items())
+            },
+            "llm_calls": stub.counts["generate"] - before["generate"],
+            "llm_prompt_tokens": stub.counts["prompt_tokens"] - before["prompt_tokens"],
+        }
+
+    try:
+        # Cold: every stage runs. Warm: unchanged inputs, all checkpoints hit
+        return {
+            "tenders": len(tender_ids),
+            "llm_latency_s": args.llm_latency,
+            "cold": run(),
+            "warm": run(),
+        }
+    finally:
+        pipeline.stage_listeners.remove(listener)
+        consolidator.shutdown_proposal_pool()
+
+
+# ---------------------------
+# API
+# ---------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _load(url: str, headers: dict, total: int, concurrency: int) -> dict:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        timeout=60,
+    ) as client:
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                t = time.perf_counter()
+                try:
+                    r = await client.get(url, headers=headers)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - t)
+                errors += 0 if ok else 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        **percentiles(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else None,
+    }
+
+
+def bench_api(args, ids: dict) -> dict:
+    import uvicorn
+    from app.auth_utils import create_token
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-api", daemon=True)
+
+    started = time.perf_counter()
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    startup_s = time.perf_counter() - started
+
+    admin = {"Authorization": "Bearer " + create_token({"sub": str(ids["admin_id"]), "role": "admin"})}
+    vendor = {"Authorization": "Bearer " + create_token({"sub": str(ids["applicant_id"]), "role": "applicant"})}
+    base = f"http://127.0.0.1:{port}"
+    endpoints = {
+        "GET /tenders": (f"{base}/tenders?limit=50", {}),
+        "GET /admin/tenders": (f"{base}/admin/tenders?limit=50", admin),
+        "GET /admin/applications": (f"{base}/admin/applications?limit=50&order=desc", admin),
+        "GET /admin/stats": (f"{base}/admin/stats", admin),
+        "GET /applicant/notifications": (f"{base}/applicant/notifications?limit=50", vendor),
+    }
+
+    results = {"startup_s": startup_s, "concurrency": args.concurrency, "endpoints": {}}
+    try:
+        for name, (url, headers) in endpoints.items():
+            # Warm the connection pool and caches before measuring
+            asyncio.run(_load(url, headers, args.concurrency, args.concurrency))
+            results["endpoints"][name] = asyncio.run(
+                _load(url, headers, args.requests, args.concurrency)
+            )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+    return results
+
+
+# ---------------------------
+# Main
+# ---------------------------
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description="OPTIBIDS benchmarks")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--skus", type=int, help="override the scale's catalog size")
+    parser.add_argument("--tenders", type=int)
+    parser.add_argument("--applications", type=int)
+    parser.add_argument("--items-per-tender", type=int, default=10)
+    parser.add_argument("--only", default=",".join(SECTIONS), help="comma list of " + ", ".join(SECTIONS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub seconds per generation")
+    parser.add_argument("--embed-backend", default="mock", choices=["mock", "ollama"])
+    parser.add_argument("--embed-dim", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=10_000, help="matcher search queries")
+    parser.add_argument("--price-lines", type=int, default=50_000)
+    parser.add_argument("--pipeline-tenders", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2_000, help="per endpoint")
+    parser.add_argument("--workdir", help="keep the sandbox here instead of a temp dir")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    for key, value in SCALES[args.scale].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    stub = StubOllama(latency=args.llm_latency, embed_dim=args.embed_dim).start()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="optibids-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    configure_env(workdir, stub, args)
+
+    # Backend/ on the path so `app` imports the same way uvicorn does
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": vars(args),
+            "env": {
+                k: os.environ.get(k)
+                for k in ("EMBED_BACKEND", "EMBED_DIM", "FAISS_INDEX_TYPE", "LLM_MAX_CONCURRENCY",
+                          "EXTRACT_MODE", "PRICING_SELECTION", "JOB_WORKERS")
+            },
+        },
+    }
+
+    # The app prints and logs to stdout; send all of it (worker
+    # processes included) to stderr so stdout carries only the report
+    sys.stdout.flush()
+    real_stdout = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        print(f"Populating {args.skus} SKUs, {args.tenders} tenders, "
+              f"{args.applications} applications in {workdir}", file=sys.stderr)
+        ids = synthetic.populate(
+            args.skus, args.tenders, args.applications, args.items_per_tender, args.seed
+        )
+        report["populate"] = {k: ids[k] for k in ("catalog_import_s", "rows_insert_s")}
+
+        # The pipeline needs an index; build it here even if not reported
+        matcher_result = bench_matcher(args)
+        if "matcher" in sections:
+            report["matcher"] = matcher_result
+        if "pricing" in sections:
+            print("Pricing ...", file=sys.stderr)
+            report["pricing"] = bench_pricing(args)
+        if "pipeline" in sections:
+            print("Pipeline ...", file=sys.stderr)
+            report["pipeline"] = bench_pipeline(args, stub)
+        if "api" in sections:
+            print("API ...", file=sys.stderr)
+            report["api"] = bench_api(args, ids)
+    finally:
+        stub.stop()
+        sys.stdout.flush()
+        os.dup2(real_stdout, 1)
+        os.close(real_stdout)
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# backend/bench/stub_ollama.py
+"""
+Stand-in for Ollama's /api/generate and /api/embeddings with canned,
+deterministic JSON and a configurable delay, so benchmarks need no
+model and no network.
+
+    python -m bench.stub_ollama --port 11434 --latency 0.5
+"""
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# "Supply 20 x Laptop i7 16GB" lines in synthetic tenders (see synthetic.py)
+_ITEM = re.compile(r"Supply (\d+) x ([^\n]+)")
+
+_DIGEST = {
+    "best_application": {
+        "application_id": 1, "email": "vendor@example.com", "price": "1000",
+        "sku": "SKU-1", "verdict": "Best value", "brief": "Meets all requirements",
+    },
+    "comparison": [
+        {
+            "application_id": 1, "email": "vendor@example.com", "price": "1000",
+            "strengths": ["price"], "weaknesses": ["lead time"],
+        }
+    ],
+}
+
+
+def canned_response(prompt: str) -> str:
+    """
+    Requirement JSON for extraction prompts (items parsed out of the
+    tender text), a fixed evaluation for everything else.
+    """
+    if "Tender text:" not in prompt:
+        return json.dumps(_DIGEST)
+
+    text = prompt.split("Tender text:", 1)[1]
+    reqs = [
+        {"text": desc.strip(), "quantity": int(qty)}
+        for qty, desc in _ITEM.findall(text)
+    ]
+    return json.dumps({"requirements": reqs, "confidence": 0.9})
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    out = []
+    block = 0
+    while len(out) < dim:
+        digest = hashlib.sha256(f"{text}\x00{block}".encode()).digest()
+        out.extend(b / 255 for b in digest)
+        block += 1
+    return out[:dim]
+
+
+class StubOllama:
+    """
+    Threaded stub server; port 0 picks a free port (see .url).
+    """
+
+    def __init__(self, latency: float = 0.0, port: int = 0, embed_dim: int = 16, host: str = "127.0.0.1"):
+        self.latency = latency
+        self.embed_dim = embed_dim
+        self.counts = {"generate": 0, "embeddings": 0, "prompt_tokens": 0, "output_tokens": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, **deltas) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.counts[k] += v
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send_json(self, payload: dict) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+                if self.path == "/api/embeddings":
+                    stub._count(embeddings=1)
+                    self._send_json({"embedding": fake_embedding(body.get("prompt", ""), stub.embed_dim)})
+                    return
+
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+
+                prompt = body.get("prompt", "")
+                response = canned_response(prompt)
+                # Rough token counts, reported like Ollama does
+                prompt_tokens = max(1, len(prompt) // 4)
+                output_tokens = max(1, len(response) // 4)
+                stub._count(generate=1, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+                time.sleep(stub.latency)
+
+                final = {
+                    "done": True,
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": output_tokens,
+                }
+                if not body.get("stream"):
+                    self._send_json({"response": response, **final})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                lines = [
+                    {"response": response[i:i + 32], "done": False}
+                    for i in range(0, len(response), 32)
+                ] + [{"response": "", **final}]
+                for line in lines:
+                    data = json.dumps(line).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                # Request counters, handy when checking cache hit rates
+                with stub._lock:
+                    self._send_json(dict(stub.counts))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per generation")
+    parser.add_argument("--embed-dim", type=int, default=16)
+    args = parser.parse_args()
+
+    stub = StubOllama(args.latency, args.port, args.embed_dim, args.host)
+    print(f"Stub Ollama on {stub.url} (latency {args.latency}s)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,149 @@
+# backend/bench/synthetic.py
+"""
+Synthetic catalogs, tenders and applications at benchmark scale.
+Everything is derived from a seeded RNG, so a given size and seed
+always produce the same data.
+"""
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+CATEGORIES = {
+    "laptop": ["Laptop", "Notebook", "Ultrabook"],
+    "monitor": ["Monitor", "Display", "LED panel"],
+    "cable": ["Power cable", "Armoured cable", "LAN cable"],
+    "transformer": ["Distribution transformer", "Power transformer"],
+    "switchgear": ["Circuit breaker", "Isolator", "RMU"],
+}
+SPECS = ["i5", "i7", "16GB", "32GB", "512SSD", "1TB", "24 inch", "27 inch", "11kV",
+         "33kV", "XLPE", "Cu", "Al", "3 core", "4 core", "IP65", "250kVA", "630A"]
+BRANDS = ["Acme", "Voltix", "Northwind", "Gridline", "Orion"]
+
+PRICING_RULES = [
+    {"category": None, "min_qty": 0, "discount_percent": 0, "margin_percent": 10},
+    {"category": None, "min_qty": 50, "discount_percent": 3, "margin_percent": 9},
+    {"category": "cable", "min_qty": 100, "discount_percent": 8, "margin_percent": 12},
+    {"category": "transformer", "min_qty": 0, "discount_percent": 0, "margin_percent": 15},
+]
+
+
+def sku_rows(n: int, seed: int = 1) -> Iterator[dict]:
+    rng = random.Random(seed)
+    cats = list(CATEGORIES)
+    for i in range(n):
+        cat = cats[i % len(cats)]
+        desc = " ".join([
+            rng.choice(BRANDS),
+            rng.choice(CATEGORIES[cat]),
+            *rng.sample(SPECS, 3),
+        ])
+        yield {
+            "sku_code": f"SKU-{i:07d}",
+            "description": desc,
+            "price_base": round(rng.uniform(50, 50000), 2),
+            "category": cat,
+        }
+
+
+def tender_text(rng: random.Random, items: int) -> str:
+    """
+    Numbered sections with "Supply <qty> x <item>" lines, the shape the
+    stub server's extraction response parses.
+    """
+    sections = ["1. Scope\n\nThe contractor shall supply, install and commission the items below."]
+    for n in range(items):
+        cat = rng.choice(list(CATEGORIES))
+        item = " ".join([rng.choice(CATEGORIES[cat]), *rng.sample(SPECS, 2)])
+        sections.append(
+            f"{n + 2}. Item {n + 1}\n\n"
+            f"Supply {rng.randint(1, 200)} x {item}\n"
+            "Delivery within 12 weeks of the purchase order, with warranty of 24 months."
+        )
+    return "\n\n".join(sections)
+
+
+def populate(
+    n_skus: int,
+    n_tenders: int,
+    n_applications: int,
+    items_per_tender: int = 10,
+    seed: int = 1,
+    batch: int = 5000,
+) -> Dict[str, float]:
+    """
+    Fill the configured database. Returns timings and the ids the
+    benchmarks need (an admin, a busy applicant).
+    """
+    from sqlalchemy import insert
+    from app.db import get_session, init_db
+    from app.models import Application, PricingRule, Tender, User
+    from app.auth_utils import hash_password
+    from app import seed_sku
+
+    rng = random.Random(seed)
+    init_db()
+    out: Dict[str, float] = {}
+
+    # Catalog through the real importer path (batched upserts)
+    started = time.perf_counter()
+    rows: List[dict] = []
+    for row in sku_rows(n_skus, seed):
+        rows.append(row)
+        if len(rows) >= batch:
+            seed_sku.upsert_batch(rows)
+            rows = []
+    seed_sku.upsert_batch(rows)
+    out["catalog_import_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    password = hash_password("bench-password")
+    # Enough applicants that every (tender, applicant) pair is unique
+    n_applicants = max(1, math.ceil(n_applications / max(1, n_tenders)))
+
+    with get_session() as session:
+        session.execute(insert(PricingRule), PRICING_RULES)
+        session.execute(insert(User), [
+            {"email": "admin@bench.local", "hashed_password": password, "role": "admin"}
+        ] + [
+            {"email": f"vendor{i}@bench.local", "hashed_password": password, "role": "applicant"}
+            for i in range(n_applicants)
+        ])
+        session.commit()
+
+        for start in range(0, n_tenders, batch):
+            tenders = []
+            for i in range(start, min(start + batch, n_tenders)):
+                text = tender_text(rng, items_per_tender)
+                tenders.append({
+                    "title": f"Tender {i}",
+                    "description": text,
+                    "raw_text": text,
+                    "status": "public" if i % 4 else "closed",
+                })
+            session.execute(insert(Tender), tenders)
+            session.commit()
+
+        # Tender ids 1..n_tenders, admin is user 1, applicants 2..
+        statuses = ["submitted", "submitted", "offered", "accepted", "rejected"]
+        epoch = datetime.utcnow() - timedelta(seconds=n_applications)
+        for start in range(0, n_applications, batch):
+            session.execute(insert(Application), [
+                {
+                    "tender_id": i % n_tenders + 1,
+                    "user_id": i // n_tenders + 2,
+                    "applicant_text": f"We offer item set {i} at competitive prices.",
+                    "status": statuses[i % len(statuses)],
+                    # Core insert: the model's default_factory does not run
+                    "created_at": epoch + timedelta(seconds=i),
+                }
+                for i in range(start, min(start + batch, n_applications))
+            ])
+            session.commit()
+
+    out["rows_insert_s"] = time.perf_counter() - started
+    out["admin_id"] = 1
+    # Applicant 2 applied to min(n_applications, n_tenders) tenders
+    out["applicant_id"] = 2
+    return out
@@ -0,0 +1,11 @@
+# backend/tests/conftest.py
+import os
+import tempfile
+
+# Before any app import: module-level config reads these
+_tmp = tempfile.mkdtemp(prefix="optibids-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/db.sqlite3"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp, "uploads")
+os.environ["FAISS_INDEX_FILE"] = os.path.join(_tmp, "faiss.index")
+os.environ["PROPOSAL_DIR"] = os.path.join(_tmp, "out")
+os.environ.setdefault("STRUCTURED_LOGS", "0")
@@ -0,0 +1,101 @@
+# backend/tests/test_query_counts.py
+"""
+List endpoints must run a constant number of SQL statements, however
+many rows they return (no per-row lookups, see the user-011 joins).
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.db import engine, get_session, init_db
+from app.models import Application, Tender, User
+from app.auth_helpers import Principal, get_current_user, require_admin, require_applicant
+
+ADMIN_ID = 1
+APPLICANT_ID = 2
+
+ENDPOINTS = [
+    "/tenders?limit=200",
+    "/admin/tenders?limit=200",
+    "/admin/applications?limit=200",
+    "/admin/accepted-offers?limit=200",
+    "/applicant/accepted",
+    "/applicant/notifications?limit=200",
+]
+
+
+def _seed(n: int) -> None:
+    """
+    Add n public tenders, each with an application from the applicant
+    (cycling offered / accepted / submitted) and one from another vendor.
+    """
+    with get_session() as session:
+        vendor = User(email=f"vendor-{n}@test.local", hashed_password="x", role="applicant")
+        session.add(vendor)
+        session.commit()
+        session.refresh(vendor)
+
+        statuses = ["offered", "accepted", "submitted"]
+        for i in range(n):
+            tender = Tender(title=f"Tender {i}", description="d", raw_text="d", status="public")
+            session.add(tender)
+            session.flush()
+            session.add(Application(
+                tender_id=tender.id, user_id=APPLICANT_ID, applicant_text="a",
+                status=statuses[i % 3], offer_json=json.dumps({"message": "m"}),
+            ))
+            session.add(Application(
+                tender_id=tender.id, user_id=vendor.id, applicant_text="b", status="accepted",
+            ))
+        session.commit()
+
+
+@pytest.fixture(scope="module")
+def client():
+    init_db()
+    with get_session() as session:
+        session.add(User(id=ADMIN_ID, email="admin@test.local", hashed_password="x", role="admin"))
+        session.add(User(id=APPLICANT_ID, email="applicant@test.local", hashed_password="x", role="applicant"))
+        session.commit()
+
+    # Auth is not under test; its user cache would make counts order-dependent
+    app.dependency_overrides[require_admin] = lambda: Principal(ADMIN_ID, "admin")
+    app.dependency_overrides[require_applicant] = lambda: Principal(APPLICANT_ID, "applicant")
+    app.dependency_overrides[get_current_user] = lambda: User(id=APPLICANT_ID, email="applicant@test.local",
+                                                              hashed_password="x", role="applicant")
+    # No context manager: startup (seed, index warmup, job workers) is not needed
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _statements(client: TestClient, path: str):
+    count = [0]
+
+    def _count(*args):
+        count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    assert response.status_code == 200, response.text
+    return count[0], len(response.json())
+
+
+def test_list_endpoints_run_constant_queries(client):
+    _seed(3)
+    few = {path: _statements(client, path) for path in ENDPOINTS}
+
+    _seed(40)
+    many = {path: _statements(client, path) for path in ENDPOINTS}
+
+    for path in ENDPOINTS:
+        (few_queries, few_rows), (many_queries, many_rows) = few[path], many[path]
+        assert many_rows > few_rows, path
+        assert many_queries == few_queries, f"{path}: {few_queries} -> {many_queries} statements"
+        assert many_queries <= 2, f"{path}: {many_queries} statements"
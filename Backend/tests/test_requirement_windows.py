@@ -0,0 +1,45 @@
+# backend/tests/test_requirement_windows.py
+"""
+Editing one section of a chunked tender must change exactly one
+extraction window, so only that window is sent to the model again.
+(The exception, an edit that pushes its run of sections past the
+window size, does not occur for this text.)
+"""
+import random
+
+import pytest
+
+from app.ai_agent import EXTRACT_WINDOW_CHARS, extraction_cache_key, requirement_windows
+
+
+SECTIONS = 39
+
+
+def _sections(n: int = SECTIONS, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    items = ["Laptop i7 16GB", "Armoured cable 3 core", "Distribution transformer 250kVA", "Circuit breaker 630A"]
+    return [
+        f"{i + 1}. Item {i + 1}\n\n"
+        f"Supply {rng.randint(1, 200)} x {rng.choice(items)}\n"
+        + "Delivery within 12 weeks of the purchase order, with warranty of 24 months. " * rng.randint(1, 6)
+        for i in range(n)
+    ]
+
+
+def _keys(sections: list) -> set:
+    text = "\n\n".join(sections)
+    assert len(text) > EXTRACT_WINDOW_CHARS  # chunked mode
+    return {extraction_cache_key(w) for w in requirement_windows(text)}
+
+
+@pytest.mark.parametrize("edited", range(SECTIONS))
+def test_editing_one_section_changes_one_window(edited):
+    sections = _sections()
+    before = _keys(sections)
+    assert len(before) > 5
+
+    sections[edited] += "\nThe vendor shall also provide on-site training."
+    after = _keys(sections)
+
+    assert len(after - before) == 1
+    assert len(before - after) == 1
@@ -7,42 +7,45 @@ const admin = {
   ================================================= */
   async loadStats() {
     try {
-      const [tenders, apps, accepted] = await Promise.all([
-        api.get('/admin/tenders'),
-        api.get('/admin/applications'),
-        api.get('/admin/accepted-offers'),
-      ]);
+      // Counted in SQL; the lists themselves are paged
+      const stats = await api.get('/admin/stats');
 
       const el = id => document.getElementById(id);
 
-      if(el('stat-tenders'))  el('stat-tenders').textContent  = Array.isArray(tenders)  ? tenders.length  : '—';
-      if(el('stat-apps'))     el('stat-apps').textContent     = Array.isArray(apps)     ? apps.length     : '—';
-      if(el('stat-accepted')) el('stat-accepted').textContent = Array.isArray(accepted) ? accepted.length  : '—';
-      if(el('stat-pending')) {
-        const pending = Array.isArray(apps) ? apps.filter(a => a.status === 'submitted').length : 0;
-        el('stat-pending').textContent = pending;
-      }
+      if(el('stat-tenders'))  el('stat-tenders').textContent  = stats.tenders ?? '—';
+      if(el('stat-apps'))     el('stat-apps').textContent     = stats.applications ?? '—';
+      if(el('stat-accepted')) el('stat-accepted').textContent = stats.accepted ?? '—';
+      if(el('stat-pending'))  el('stat-pending').textContent  = stats.pending ?? 0;
     } catch(e) { console.warn('Stats load failed', e); }
   },
 
   /* =================================================
      LOAD TENDERS
   ================================================= */
-  async loadTenders() {
+  tendersCursor: null,
+
+  async loadTenders(more = false) {
     const box = document.getElementById('tenders-list');
     if (!box) return;
 
-    box.innerHTML = '<div class="loading-state"><div class="spinner"></div><p>Loading tenders…</p></div>';
+    if (!more) {
+      this.tendersCursor = null;
+      box.innerHTML = '<div class="loading-state"><div class="spinner"></div><p>Loading tenders…</p></div>';
+    }
 
     try {
-      const tenders = await api.get('/admin/tenders');
+      const { items: tenders, next } = await api.page('/admin/tenders?limit=20', this.tendersCursor);
+      this.tendersCursor = next;
+      // Replaced below when there is another page
+      const moreBtn = document.getElementById('tenders-more');
+      if (moreBtn) moreBtn.remove();
 
-      if (!Array.isArray(tenders) || !tenders.length) {
+      if (!more && !tenders.length) {
         box.innerHTML = '<div class="empty-state"><i class="fas fa-file-contract"></i><p>No tenders yet. <a href="create_tender.html">Create your first tender</a>.</p></div>';
         return;
       }
 
-      box.innerHTML = '';
+      if (!more) box.innerHTML = '';
       tenders.forEach(t => {
         const div = document.createElement('div');
         div.className = 'tender-item';
@@ -74,7 +77,19 @@ const admin = {
         box.appendChild(div);
       });
 
+      if (next) {
+        const btn = document.createElement('button');
+        btn.id = 'tenders-more';
+        btn.className = 'auth-btn small';
+        btn.style.marginTop = '1rem';
+        btn.innerHTML = '<i class="fas fa-chevron-down"></i> Load more';
+        btn.onclick = () => admin.loadTenders(true);
+        box.appendChild(btn);
+      }
+
     } catch(err) {
+      // Keep the cards and the button already shown; the click can be retried
+      if (more) { console.warn('Loading more tenders failed', err); return; }
       box.innerHTML = '<div class="empty-state"><i class="fas fa-exclamation-triangle"></i><p>Failed to load tenders.</p></div>';
     }
   },
@@ -89,7 +104,8 @@ const admin = {
     box.innerHTML = '<div class="loading-state"><div class="spinner"></div><p>Loading…</p></div>';
 
     try {
-      const apps = await api.get('/admin/applications');
+      // Newest first, only what the card shows
+      const apps = await api.get('/admin/applications?limit=8&order=desc&fields=id,user_email,tender_title,status');
 
       if (!Array.isArray(apps) || !apps.length) {
         box.innerHTML = '<div class="empty-state"><i class="fas fa-inbox"></i><p>No applications yet.</p></div>';
@@ -97,7 +113,7 @@ const admin = {
       }
 
       box.innerHTML = '';
-      apps.slice(0, 8).forEach(a => {
+      apps.forEach(a => {
         const div = document.createElement('div');
         div.className = `tender-item status-${a.status}`;
         div.innerHTML = `
@@ -153,7 +169,25 @@ const admin = {
       </div>`;
 
     try {
-      const res = await api.post(`/admin/tenders/${tenderId}/summary`, {});
+      // Stream tokens so the panel shows progress within a second
+      let res = null, failed = null, streamed = '';
+
+      await api.stream(`/admin/tenders/${tenderId}/summary?stream=true`, {}, (event, data) => {
+        if (event === 'token') {
+          streamed += data.text;
+          const live = panel.querySelector('.loading-state');
+          if (live) {
+            live.style.cssText = 'padding:1rem 0;text-align:left;white-space:pre-wrap;font-size:0.78rem;color:var(--text-3);';
+            live.textContent = streamed;
+          }
+        } else if (event === 'summary' || event === 'json') {
+          res = data;
+        } else if (event === 'error') {
+          failed = data && data.detail;
+        }
+      });
+
+      if (failed || !res) throw new Error(failed || 'Empty AI response');
 
       if (res.error) {
         panel.innerHTML = `<div class="ai-panel"><p style="color:var(--text-2);">${res.error}</p></div>`;
@@ -2,7 +2,7 @@
 
 const BASE = 'http://localhost:8000';
 
-async function rawFetch(path, opts = {}) {
+async function rawFetch(path, opts = {}, withHeaders = false) {
   const url = BASE + path;
   const headers = { ...(opts.headers || {}) };
 
@@ -40,15 +40,95 @@ async function rawFetch(path, opts = {}) {
   }
 
   const ct = res.headers.get('content-type') || '';
-  if (ct.includes('application/json')) return res.json();
-  return res.text();
+  const body = ct.includes('application/json') ? await res.json() : await res.text();
+  return withHeaders ? { body, headers: res.headers } : body;
+}
+
+// GET one page of a list endpoint. Resolves to { items, next }, where
+// next is the cursor for the following page (null on the last page).
+async function pageFetch(path, cursor = null) {
+  const url = cursor == null
+    ? path
+    : path + (path.includes('?') ? '&' : '?') + `cursor=${encodeURIComponent(cursor)}`;
+  const { body, headers } = await rawFetch(url, { method: 'GET' }, true);
+  return {
+    items: Array.isArray(body) ? body : [],
+    next: headers.get('X-Next-Cursor'),
+  };
+}
+
+// GET every page of a list endpoint, following X-Next-Cursor.
+// For lists the page shows in full (offers, notifications).
+async function pageAll(path) {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await pageFetch(path, cursor);
+    items.push(...page.items);
+    cursor = page.next;
+  } while (cursor);
+  return items;
+}
+
+// POST + read a text/event-stream response, calling onEvent(event, data)
+// for every SSE message as it arrives.
+async function streamFetch(path, body, onEvent) {
+  const headers = { 'Content-Type': 'application/json' };
+  const token = localStorage.getItem('token');
+  if (token) headers.Authorization = `Bearer ${token}`;
+
+  const res = await fetch(BASE + path, {
+    method: 'POST',
+    body: JSON.stringify(body || {}),
+    headers,
+  });
+
+  if (res.status === 401) {
+    localStorage.removeItem('token');
+    window.location.href = '/login.html';
+    throw new Error('Unauthorized');
+  }
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+  // Plain JSON (e.g. "no applications") instead of a stream
+  const ct = res.headers.get('content-type') || '';
+  if (!ct.includes('text/event-stream')) {
+    onEvent('json', await res.json());
+    return;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buf.indexOf('\n\n')) !== -1) {
+      const msg = buf.slice(0, sep);
+      buf = buf.slice(sep + 2);
+
+      let event = 'message', data = '';
+      msg.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      try { onEvent(event, data ? JSON.parse(data) : null); } catch (e) { console.warn('Bad SSE payload', e); }
+    }
+  }
 }
 
 window.api = {
   get:    (path)        => rawFetch(path, { method: 'GET' }),
+  page:   (path, cursor) => pageFetch(path, cursor),
+  all:    (path)        => pageAll(path),
   post:   (path, body)  => rawFetch(path, {
     method: 'POST',
     body: body instanceof FormData ? body : JSON.stringify(body),
   }),
   upload: (path, form)  => rawFetch(path, { method: 'POST', body: form }),
+  stream: (path, body, onEvent) => streamFetch(path, body, onEvent),
 };
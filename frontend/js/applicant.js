@@ -5,21 +5,30 @@ const applicant = {
   /* =================================================
      LOAD PUBLIC TENDERS
   ================================================= */
-  async loadTenders() {
+  tendersCursor: null,
+
+  async loadTenders(more = false) {
     const box = document.getElementById('public-tenders');
     if (!box) return;
 
-    box.innerHTML = '<div class="loading-state"><div class="spinner"></div><p>Loading tenders…</p></div>';
+    if (!more) {
+      this.tendersCursor = null;
+      box.innerHTML = '<div class="loading-state"><div class="spinner"></div><p>Loading tenders…</p></div>';
+    }
 
     try {
-      const tenders = await api.get('/tenders');
+      const { items: tenders, next } = await api.page('/tenders?status=public&limit=50', this.tendersCursor);
+      this.tendersCursor = next;
+      // Replaced below when there is another page
+      const moreBtn = document.getElementById('public-tenders-more');
+      if (moreBtn) moreBtn.remove();
 
-      if (!Array.isArray(tenders) || !tenders.length) {
+      if (!more && !tenders.length) {
         box.innerHTML = '<div class="empty-state"><i class="fas fa-file-contract"></i><p>No public tenders available right now.</p></div>';
         return;
       }
 
-      box.innerHTML = '';
+      if (!more) box.innerHTML = '';
       tenders.forEach(t => {
         const div = document.createElement('div');
         div.className = 'tender-item';
@@ -44,7 +53,19 @@ const applicant = {
         box.appendChild(div);
       });
 
+      if (next) {
+        const btn = document.createElement('button');
+        btn.id = 'public-tenders-more';
+        btn.className = 'auth-btn small';
+        btn.style.marginTop = '1rem';
+        btn.innerHTML = '<i class="fas fa-chevron-down"></i> Load more';
+        btn.onclick = () => applicant.loadTenders(true);
+        box.appendChild(btn);
+      }
+
     } catch(e) {
+      // Keep the cards and the button already shown; the click can be retried
+      if (more) { console.warn('Loading more tenders failed', e); return; }
       box.innerHTML = '<div class="empty-state"><i class="fas fa-exclamation-triangle"></i><p>Failed to load tenders.</p></div>';
     }
   },
@@ -86,7 +107,7 @@ const applicant = {
     box.innerHTML = '<div class="loading-state"><div class="spinner"></div><p>Checking for offers…</p></div>';
 
     try {
-      const offers = await api.get('/applicant/notifications');
+      const offers = await api.all('/applicant/notifications?limit=200');
 
       if (!offers.length) {
         box.innerHTML = '<div class="empty-state" style="padding:1.5rem;"><i class="fas fa-bell-slash"></i><p>No pending offers at this time.</p></div>';